@@ -0,0 +1,105 @@
+import hashlib
+import json
+from collections import OrderedDict
+from threading import Lock
+
+import frappe
+
+CARRIER_INDEX_EXPIRY = 7 * 24 * 60 * 60
+# compiled indexes are also kept in-process, so lookups during label generation
+# don't need a round-trip to Redis (or a site context, in worker threads)
+LOCAL_INDEX_SIZE = 32
+
+_local_indexes: "OrderedDict[str, dict]" = OrderedDict()
+_local_indexes_lock = Lock()
+
+
+def get_carrier_data_hash(carrier_data: str | None) -> str:
+	return hashlib.sha256((carrier_data or "").encode()).hexdigest()
+
+
+def get_carrier_index(carrier_data: str | None) -> dict:
+	"""
+	Get the compiled index for an account's carrier data. Indexes are keyed by a hash
+	of the carrier data, so a refresh from Shipstation naturally gets a new index.
+	"""
+
+	data_hash = get_carrier_data_hash(carrier_data)
+
+	with _local_indexes_lock:
+		if data_hash in _local_indexes:
+			_local_indexes.move_to_end(data_hash)
+			return _local_indexes[data_hash]
+
+	key = f"shipstation_carrier_index|{data_hash}"
+	index = frappe.cache().get_value(key)
+	if index is None:
+		index = compile_carrier_index(carrier_data)
+		frappe.cache().set_value(key, index, expires_in_sec=CARRIER_INDEX_EXPIRY)
+
+	with _local_indexes_lock:
+		_local_indexes[data_hash] = index
+		while len(_local_indexes) > LOCAL_INDEX_SIZE:
+			_local_indexes.popitem(last=False)
+
+	return index
+
+
+def compile_carrier_index(carrier_data: str | None) -> dict:
+	"""
+	Compile the carrier data into lookups from carrier names and nicknames to their
+	codes, service codes and package codes, along with the options shown in the desk.
+
+	```
+	{
+		"carriers": {
+			"<name or nickname>": {
+				"code": "<carrier code>",
+				"services": {"<service name>": "<service code>"},
+				"packages": {"<package name>": "<package code>"},
+			},
+		},
+		"options": [
+			{
+				"name": "<carrier name>",
+				"nickname": "<carrier nickname>",
+				"account_number": "<account number>",
+				"primary": True,
+				"services": [{"name": "<service name>"}],
+				"packages": [{"name": "<package name>"}],
+			},
+		],
+	}
+	```
+	"""
+
+	carriers = {}
+	options = []
+
+	for carrier in json.loads(carrier_data or "[]"):
+		services = carrier.get("services") or []
+		packages = carrier.get("packages") or []
+
+		lookup = {
+			"code": carrier.get("code"),
+			"services": {service.get("name"): service.get("code") for service in services},
+			"packages": {package.get("name"): package.get("code") for package in packages},
+		}
+
+		# a later carrier with the same name or nickname takes precedence
+		for label in (carrier.get("name"), carrier.get("nickname")):
+			if label:
+				carriers[label] = lookup
+
+		options.append(
+			{
+				"name": carrier.get("name"),
+				"nickname": carrier.get("nickname"),
+				"account_number": carrier.get("account_number"),
+				"primary": carrier.get("primary"),
+				"services": [{"name": service.get("name")} for service in services],
+				"packages": [{"name": package.get("name")} for package in packages],
+			}
+		)
+
+	return {"carriers": carriers, "options": options}
@@ -0,0 +1,245 @@
+import hashlib
+import importlib.util
+import os
+import threading
+import time
+
+import httpx
+from shipstation import ShipStation
+
+# HTTP/2 support in httpx needs the optional `h2` package
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+CONNECTION_LIMITS = httpx.Limits(
+	max_connections=20,
+	max_keepalive_connections=10,
+	keepalive_expiry=60,
+)
+
+# Shipstation's default request budget per API key; the actual budget is read
+# from the rate limit headers on every response
+RATE_LIMIT_REQUESTS = 40
+RATE_LIMIT_PERIOD = 60
+
+# how many times a rate-limited (HTTP 429) request is retried after waiting for the reset
+RATE_LIMIT_RETRIES = 3
+
+# process-wide connection pools, keyed by the Shipstation Settings name
+_sessions: dict[str, tuple[str, int, httpx.Client]] = {}
+_sessions_lock = threading.Lock()
+
+# an alternate transport for all Shipstation requests, e.g. a local stand-in server for tests
+_transport: httpx.BaseTransport | None = None
+
+# process-wide request schedulers, keyed by a hash of the API key
+_rate_limiters: dict[str, "RateLimiter"] = {}
+_rate_limiters_lock = threading.Lock()
+
+# the requests each thread had held back by a rate limiter, so a sync run can record
+# the throttling of its own requests
+_throttling = threading.local()
+
+
+class RateLimiter:
+	"""
+	A token bucket that paces requests to the request budget of a Shipstation
+	API key, shared by every client that uses the key.
+
+	The bucket is corrected using the `X-Rate-Limit-*` headers from each
+	response, and requests are held back until the reset once the budget has
+	been used up.
+	"""
+
+	def __init__(self, limit: int = RATE_LIMIT_REQUESTS, period: int = RATE_LIMIT_PERIOD):
+		self.limit = limit
+		self.period = period
+		self.tokens = float(limit)
+		self.updated_at = time.monotonic()
+		self.blocked_until = 0.0
+		self.lock = threading.Lock()
+
+	def acquire(self):
+		"""
+		Wait until a request can be sent within the budget.
+		"""
+
+		throttled_seconds = 0.0
+		while True:
+			with self.lock:
+				now = time.monotonic()
+				self._refill(now)
+
+				wait = self.blocked_until - now
+				if wait <= 0:
+					if self.tokens >= 1:
+						self.tokens -= 1
+						break
+					wait = (1 - self.tokens) * self.period / self.limit
+
+			throttled_seconds += wait
+			time.sleep(wait)
+
+		if throttled_seconds:
+			_throttling.requests = getattr(_throttling, "requests", 0) + 1
+			_throttling.seconds = getattr(_throttling, "seconds", 0.0) + throttled_seconds
+
+	def update(self, response: httpx.Response):
+		"""
+		Sync the bucket with the budget reported by Shipstation.
+		"""
+
+		limit = _get_int_header(response, "X-Rate-Limit-Limit")
+		remaining = _get_int_header(response, "X-Rate-Limit-Remaining")
+		reset = _get_int_header(response, "X-Rate-Limit-Reset")
+
+		with self.lock:
+			now = time.monotonic()
+			self._refill(now)
+
+			if limit:
+				self.limit = limit
+
+			if remaining is not None:
+				self.tokens = min(self.tokens, float(remaining))
+
+			if reset is not None and (remaining == 0 or response.status_code == 429):
+				self.tokens = 0.0
+				self.blocked_until = max(self.blocked_until, now + reset)
+
+	def _refill(self, now: float):
+		elapsed = now - self.updated_at
+		self.tokens = min(float(self.limit), self.tokens + elapsed * self.limit / self.period)
+		self.updated_at = now
+
+
+def get_throttling() -> tuple[int, float]:
+	"""
+	Get the number of requests the rate limiters have held back on the current thread,
+	and the seconds they were held back for.
+	"""
+
+	return getattr(_throttling, "requests", 0), getattr(_throttling, "seconds", 0.0)
+
+
+def _get_int_header(response: httpx.Response, header: str) -> int | None:
+	try:
+		return int(response.headers[header])
+	except (KeyError, ValueError):
+		return None
+
+
+class PooledShipStation(ShipStation):
+	"""
+	A Shipstation client that sends its requests through a shared keep-alive
+	connection pool, instead of opening a new connection for every request.
+	"""
+
+	def __init__(self, session: httpx.Client, rate_limiter: RateLimiter, *args, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.session = session
+		self.rate_limiter = rate_limiter
+
+	def get(self, endpoint: str = "", payload: dict | None = None) -> httpx.Response:
+		return self.request("GET", endpoint, params=payload)
+
+	def post(self, endpoint: str = "", data: str | None = None) -> httpx.Response:
+		return self.request("POST", endpoint, content=data, headers={"content-type": "application/json"})
+
+	def put(self, endpoint: str = "", data: str | None = None) -> httpx.Response:
+		return self.request("PUT", endpoint, content=data, headers={"content-type": "application/json"})
+
+	def delete(self, endpoint: str = "") -> httpx.Response:
+		return self.request("DELETE", endpoint)
+
+	def request(self, method: str, endpoint: str = "", **kwargs) -> httpx.Response:
+		for attempt in range(RATE_LIMIT_RETRIES + 1):
+			self.rate_limiter.acquire()
+			response = self.session.request(method, f"{self.url}{endpoint}", timeout=self.timeout, **kwargs)
+			self.rate_limiter.update(response)
+
+			# the limiter now holds requests back until the budget resets, so retry
+			if response.status_code != httpx.codes.TOO_MANY_REQUESTS:
+				break
+
+		response.raise_for_status()
+		return response
+
+
+def get_client(
+	settings_name: str | None, key: str, secret: str, timeout: int = 30
+) -> PooledShipStation:
+	"""
+	Get a Shipstation client for an account that reuses the account's pooled
+	connections. Accounts that haven't been saved yet get a one-off connection.
+	"""
+
+	return PooledShipStation(
+		get_session(settings_name, key, secret) if settings_name else create_session(key, secret),
+		get_rate_limiter(key),
+		key=key,
+		secret=secret,
+		debug=False,
+		timeout=timeout,
+	)
+
+
+def get_session(settings_name: str, key: str, secret: str) -> httpx.Client:
+	credentials = hashlib.sha256(f"{key}:{secret}".encode()).hexdigest()
+	pid = os.getpid()
+
+	with _sessions_lock:
+		cached_session = _sessions.get(settings_name)
+		if cached_session:
+			cached_credentials, cached_pid, session = cached_session
+			# connections can't be shared with forked worker processes, and a
+			# changed API key or secret needs a fresh pool
+			if cached_credentials == credentials and cached_pid == pid:
+				return session
+			if cached_pid == pid:
+				session.close()
+
+		session = create_session(key, secret)
+		_sessions[settings_name] = (credentials, pid, session)
+		return session
+
+
+def create_session(key: str, secret: str) -> httpx.Client:
+	return httpx.Client(
+		auth=(key, secret),
+		http2=HTTP2_AVAILABLE,
+		limits=CONNECTION_LIMITS,
+		transport=_transport,
+	)
+
+
+def close_session(settings_name: str):
+	with _sessions_lock:
+		cached_session = _sessions.pop(settings_name, None)
+
+	if cached_session and cached_session[1] == os.getpid():
+		cached_session[2].close()
+
+
+def set_transport(transport: httpx.BaseTransport | None):
+	"""
+	Send all Shipstation requests through the given transport (or back through
+	the network, if unset). Used to run the sync against a local stand-in server.
+	"""
+
+	global _transport
+	_transport = transport
+
+	for settings_name in list(_sessions):
+		close_session(settings_name)
+
+
+def get_rate_limiter(key: str) -> RateLimiter:
+	"""
+	Get the request scheduler for an API key, shared by all accounts using the key.
+	"""
+
+	key_hash = hashlib.sha256(key.encode()).hexdigest()
+	with _rate_limiters_lock:
+		if key_hash not in _rate_limiters:
+			_rate_limiters[key_hash] = RateLimiter()
+		return _rate_limiters[key_hash]
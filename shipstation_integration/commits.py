@@ -0,0 +1,87 @@
+import time
+from contextlib import contextmanager
+
+import frappe
+
+# lookups cached on `frappe.local` for the duration of a sync run
+SYNC_CACHES = ("shipstation_item_codes", "shipstation_billing_addresses", "shipstation_stock_uoms")
+
+
+def commit():
+	"""
+	Commit the current transaction, unless the sync is batching its commits.
+	"""
+
+	if not frappe.flags.in_shipstation_batch:
+		frappe.db.commit()
+
+
+@contextmanager
+def batched_commits():
+	"""
+	Defer the commits made while syncing individual documents, leaving it to the
+	run's `CommitBatch` to commit the documents in batches.
+	"""
+
+	in_batch = frappe.flags.in_shipstation_batch
+	frappe.flags.in_shipstation_batch = True
+	try:
+		yield
+	finally:
+		frappe.flags.in_shipstation_batch = in_batch
+
+
+class CommitBatch:
+	"""
+	Wraps each synced document in a savepoint, and commits after every
+	`batch_size` documents or `interval` seconds, whichever comes first.
+	"""
+
+	def __init__(self, batch_size: int = 1, interval: int = 0):
+		self.batch_size = max(batch_size, 1)
+		self.interval = interval
+		self.pending = 0
+		self.failed = 0
+		self.last_commit = time.monotonic()
+
+	@contextmanager
+	def savepoint(self, title: str):
+		"""
+		Run the sync for a single document. If it fails, only the document's
+		changes are rolled back and the error is logged.
+		"""
+
+		savepoint = f"shipstation_{frappe.generate_hash(length=10)}"
+		frappe.db.savepoint(savepoint)
+
+		try:
+			yield
+		except Exception:
+			frappe.db.rollback(save_point=savepoint)
+			clear_sync_caches()
+			frappe.log_error(title=title, message=frappe.get_traceback())
+			self.failed += 1
+		else:
+			frappe.db.release_savepoint(savepoint)
+			self.pending += 1
+
+		if self.pending >= self.batch_size or (
+			self.interval and time.monotonic() - self.last_commit >= self.interval
+		):
+			self.commit()
+
+	def commit(self):
+		frappe.db.commit()
+		self.pending = 0
+		self.last_commit = time.monotonic()
+
+
+def clear_sync_caches():
+	"""
+	Drop the run's cached lookups, since they may point at Items or Addresses created
+	in a savepoint that was rolled back. They're filled again as the run continues.
+	"""
+
+	for cache in SYNC_CACHES:
+		if hasattr(frappe.local, cache):
+			delattr(frappe.local, cache)
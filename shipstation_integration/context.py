@@ -0,0 +1,81 @@
+from typing import TYPE_CHECKING
+
+import frappe
+from frappe.utils import cint
+
+from shipstation_integration.commits import CommitBatch
+from shipstation_integration.extensions import HookRegistry
+
+if TYPE_CHECKING:
+	from shipstation_integration.shipstation_integration.doctype.shipstation_settings.shipstation_settings import (
+		ShipstationSettings,
+	)
+
+
+class SyncContext:
+	"""
+	State shared by every order processed in a single sync run, so that settings
+	and lookups are loaded once per run instead of once per order or line item.
+	"""
+
+	def __init__(self):
+		self.settings: dict[str, "ShipstationSettings"] = {}
+		self.option_maps: dict[str, dict[str, str | None]] = {}
+		self.new_options: dict[str, list[str]] = {}
+		self.commit_batches: dict[str, CommitBatch] = {}
+		self.hooks = HookRegistry()
+
+	def add_settings(self, settings: "ShipstationSettings"):
+		self.settings[settings.name] = settings
+
+	def get_settings(self, settings_name: str) -> "ShipstationSettings":
+		if settings_name not in self.settings:
+			self.settings[settings_name] = frappe.get_doc("Shipstation Settings", settings_name)
+		return self.settings[settings_name]
+
+	def get_commit_batch(self, settings_name: str) -> CommitBatch:
+		if settings_name not in self.commit_batches:
+			settings = self.get_settings(settings_name)
+			self.commit_batches[settings_name] = CommitBatch(
+				batch_size=cint(settings.get("commit_batch_size")) or 1,
+				interval=cint(settings.get("commit_interval")),
+			)
+		return self.commit_batches[settings_name]
+
+	def get_option_map(self, settings_name: str) -> dict[str, str | None]:
+		"""
+		Get the Shipstation option names for an account, mapped to the order item
+		fields they should be imported into.
+		"""
+
+		if settings_name not in self.option_maps:
+			settings = self.get_settings(settings_name)
+			self.option_maps[settings_name] = {
+				option.shipstation_option_name: option.item_field for option in settings.shipstation_options
+			}
+		return self.option_maps[settings_name]
+
+	def add_option(self, settings_name: str, option_name: str):
+		"""
+		Queue a newly seen Shipstation option to be added to the account's Options
+		Import table once the run completes.
+		"""
+
+		option_map = self.get_option_map(settings_name)
+		if option_name in option_map:
+			return
+
+		option_map[option_name] = None
+		self.new_options.setdefault(settings_name, []).append(option_name)
+
+	def save_new_options(self):
+		for settings_name, option_names in self.new_options.items():
+			# reload the settings, since they may have changed while the run was in progress
+			settings: "ShipstationSettings" = frappe.get_doc("Shipstation Settings", settings_name)
+			existing_options = {option.shipstation_option_name for option in settings.shipstation_options}
+			for option_name in option_names:
+				if option_name not in existing_options:
+					settings.append("shipstation_options", {"shipstation_option_name": option_name})
+			settings.save()
+
+		self.new_options = {}
@@ -1,8 +1,11 @@
+import hashlib
 from typing import TYPE_CHECKING
 
 import frappe
 from frappe.utils import getdate, parse_addr
 from frappe.query_builder import DocType
+
+from shipstation_integration.commits import commit
 # from frappe.query_builder.functions import Coalesce
 
 if TYPE_CHECKING:
@@ -115,6 +118,8 @@ def _update_address(address: "ShipStationAddress", addr: "Address", email: str,
     addr.country = frappe.get_cached_value("Country", {"code": address.country}, "name")
     addr.phone = address.phone
     addr.email = email
+    addr.shipstation_address_hash = get_address_hash(address, email, address_type)
+    addr.flags.from_shipstation = True
     try:
         addr.save()
         return addr
@@ -122,10 +127,72 @@ def _update_address(address: "ShipStationAddress", addr: "Address", email: str,
         frappe.log_error(title="Error saving Shipstation Address", message=e)
 
 
+def get_address_hash(address_data: "ShipStationAddress", email: str, address_type: str) -> str:
+    """
+    Build a fingerprint of a Shipstation address, to find addresses that have
+    already been synced without comparing each field.
+    """
+
+    values = [
+        address_type,
+        address_data.street1,
+        address_data.street2,
+        address_data.street3,
+        address_data.city,
+        address_data.state,
+        address_data.postal_code,
+        address_data.country,
+        address_data.phone,
+        email,
+    ]
+    normalized = "|".join(" ".join(str(value or "").split()).casefold() for value in values)
+    return hashlib.sha256(normalized.encode()).hexdigest()
+
+
+def clear_address_hash(doc: "Address", method: str | None = None):
+    # an address edited outside of the sync no longer matches its Shipstation fingerprint
+    if doc.flags.from_shipstation or doc.is_new() or not doc.get("shipstation_address_hash"):
+        return
+
+    address_fields = (
+        "address_type",
+        "address_line1",
+        "address_line2",
+        "address_line3",
+        "city",
+        "state",
+        "pincode",
+        "country",
+        "phone",
+    )
+    if any(doc.has_value_changed(field) for field in address_fields):
+        doc.shipstation_address_hash = None
+
+
 def create_or_update_address(address_data, customer_name, email, address_type):
     DynamicLink = DocType("Dynamic Link")
     Address = DocType("Address")
 
+    address_hash = get_address_hash(address_data, email, address_type)
+
+    # repeat customers usually ship to the same address, which doesn't need to be saved again
+    unchanged_address = (
+        frappe.qb.from_(Address)
+        .join(DynamicLink)
+        .on(DynamicLink.parent == Address.name)
+        .select(Address.name)
+        .where(
+            (Address.shipstation_address_hash == address_hash)
+            & (DynamicLink.link_doctype == "Customer")
+            & (DynamicLink.link_name == customer_name)
+        )
+        .limit(1)
+        .run(as_dict=True)
+    )
+
+    if unchanged_address:
+        return frappe.get_cached_doc("Address", unchanged_address[0].name)
+
     existing_address = (
         frappe.qb.from_(DynamicLink)
         .select(DynamicLink.parent)
@@ -157,14 +224,20 @@ def create_or_update_address(address_data, customer_name, email, address_type):
     addr.country = frappe.get_cached_value("Country", {"code": address_data.country}, "name")
     addr.phone = address_data.phone
     addr.email = email
+    addr.shipstation_address_hash = address_hash
+    addr.flags.from_shipstation = True
 
     try:
         addr.save()
-        return addr
     except Exception as e:
         frappe.log_error(title=f"Error saving {address_type} Address", message=str(e))
         return None
 
+    if address_type == "Billing" and not get_billing_address_cache().get(customer_name):
+        get_billing_address_cache()[customer_name] = addr.name
+
+    return addr
+
 
 def create_customer(order: "ShipStationOrder"):
     customer_id = (
@@ -190,7 +263,7 @@ def create_customer(order: "ShipStationOrder"):
             cust.customer_group = "ShipStation"
             cust.territory = "United States"
             cust.save()
-            frappe.db.commit()
+            commit()
 
             email_id, _ = parse_addr(customer_name)
             if email_id:
@@ -228,23 +301,46 @@ def create_contact(order: "ShipStationOrder", customer_name: str):
         cont.append("links", {"link_doctype": "Customer", "link_name": customer_name})
     try:
         cont.save()
-        frappe.db.commit()
+        commit()
         return cont
     except Exception as e:
         frappe.log_error(title="Error saving Shipstation Contact", message=e)
 
 
 def get_billing_address(customer_name: str):
-    billing_address = frappe.db.sql(
-        """
-			SELECT `tabAddress`.name
-			FROM `tabDynamic Link`, `tabAddress`
-			WHERE `tabDynamic Link`.link_doctype = 'Customer'
-			AND `tabDynamic Link`.link_name = %(customer_name)s
-			AND `tabAddress`.address_type = 'Billing'
-			LIMIT 1
-		""",
-        {"customer_name": customer_name},
-        as_dict=True,
+    billing_addresses = get_billing_address_cache()
+    if customer_name in billing_addresses:
+        return billing_addresses[customer_name]
+
+    billing_address = get_billing_address_query(customer_name).run(as_dict=True)
+
+    billing_addresses[customer_name] = billing_address[0].get("name") if billing_address else None
+    return billing_addresses[customer_name]
+
+
+def get_billing_address_query(customer_name: str):
+    # the Dynamic Link lookup is covered by its (link_doctype, link_name) index,
+    # and addresses are joined on their primary key
+    DynamicLink = DocType("Dynamic Link")
+    Address = DocType("Address")
+
+    return (
+        frappe.qb.from_(DynamicLink)
+        .join(Address)
+        .on(Address.name == DynamicLink.parent)
+        .select(Address.name)
+        .where(
+            (DynamicLink.link_doctype == "Customer")
+            & (DynamicLink.link_name == customer_name)
+            & (DynamicLink.parenttype == "Address")
+            & (Address.address_type == "Billing")
+        )
+        .limit(1)
     )
-    return billing_address[0].get("name") if billing_address else None
+
+
+def get_billing_address_cache() -> dict[str, str | None]:
+    # `frappe.local` is reset for every request and job, so lookups are only cached for its duration
+    if not hasattr(frappe.local, "shipstation_billing_addresses"):
+        frappe.local.shipstation_billing_addresses = {}
+    return frappe.local.shipstation_billing_addresses
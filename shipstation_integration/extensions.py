@@ -0,0 +1,32 @@
+from typing import Callable
+
+import frappe
+
+# extension points that other apps can register in their `hooks.py`
+SHIPSTATION_HOOKS = (
+	"update_shipstation_list_order_parameters",
+	"process_shipstation_order",
+	"process_shipstation_amazon_order",
+	"process_shipstation_shopify_order",
+	"update_shipstation_amazon_order",
+	"update_shipstation_shopify_order",
+	"process_shipstation_order_items",
+	"update_shipstation_order_before_submit",
+	"update_shipstation_item_before_save",
+)
+
+
+class HookRegistry:
+	"""
+	The handlers for the Shipstation extension points, resolved and imported once at
+	the start of a sync run. Only the first handler registered for a hook is used.
+	"""
+
+	def __init__(self):
+		self.handlers: dict[str, Callable | None] = {}
+		for hook in SHIPSTATION_HOOKS:
+			handlers = frappe.get_hooks(hook)
+			self.handlers[hook] = frappe.get_attr(handlers[0]) if handlers else None
+
+	def get(self, hook: str) -> Callable | None:
+		return self.handlers.get(hook)
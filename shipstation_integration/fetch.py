@@ -0,0 +1,86 @@
+import queue
+import threading
+from collections.abc import Callable, Hashable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+
+# the largest page size allowed by the Shipstation API
+PAGE_SIZE = 500
+
+# pages fetched ahead of processing, across all stores in a run; this bounds
+# the number of records held in memory at any time
+MAX_PENDING_PAGES = 4
+
+
+def iter_pages(
+	list_method: Callable, parameters: dict, page_size: int = PAGE_SIZE
+) -> Iterator[list]:
+	"""
+	Fetch the results of a Shipstation list endpoint (orders, shipments, etc.)
+	one page at a time, instead of loading the whole result set.
+	"""
+
+	page = 1
+	while True:
+		response = list_method(parameters={**parameters, "page": page, "page_size": page_size})
+		results = response.results or []
+		if results:
+			yield results
+
+		pages = getattr(response, "pages", None)
+		if len(results) < page_size or (pages and page >= pages):
+			return
+
+		page += 1
+
+
+class PageStream:
+	"""
+	Fetch pages from several Shipstation list requests in background threads,
+	and hand them back one at a time to the calling thread for processing.
+	"""
+
+	def __init__(self, max_pending_pages: int = MAX_PENDING_PAGES):
+		self.pages = queue.Queue(maxsize=max_pending_pages)
+		self.stopped = threading.Event()
+		self.pending = 0
+
+	def submit(
+		self, executor: ThreadPoolExecutor, key: Hashable, list_method: Callable, parameters: dict
+	):
+		self.pending += 1
+		executor.submit(self._fetch, key, list_method, parameters)
+
+	def close(self):
+		self.stopped.set()
+
+	def __iter__(self) -> Iterator[tuple[Hashable, list | None, Exception | None]]:
+		"""
+		Yields a `(key, page, error)` tuple for every fetched page. Once a request
+		is exhausted (or fails), a final tuple with an empty page is yielded for it.
+		"""
+
+		while self.pending:
+			key, page, error = self.pages.get()
+			if page is None:
+				self.pending -= 1
+			yield key, page, error
+
+	def _fetch(self, key: Hashable, list_method: Callable, parameters: dict):
+		try:
+			for page in iter_pages(list_method, parameters):
+				if not self._put((key, page, None)):
+					return
+		except Exception as e:
+			self._put((key, None, e))
+		else:
+			self._put((key, None, None))
+
+	def _put(self, item: tuple) -> bool:
+		# wait for the processing thread to catch up, unless it has stopped consuming pages
+		while not self.stopped.is_set():
+			try:
+				self.pages.put(item, timeout=1)
+				return True
+			except queue.Full:
+				continue
+		return False
@@ -34,7 +34,7 @@ doctype_js = {
 	"Sales Order": "public/js/sales_order.js",
 }
 
-# doctype_list_js = {"doctype" : "public/js/doctype_list.js"}
+doctype_list_js = {"Delivery Note": "public/js/delivery_note_list.js"}
 # doctype_tree_js = {"doctype" : "public/js/doctype_tree.js"}
 # doctype_calendar_js = {"doctype" : "public/js/doctype_calendar.js"}
 
@@ -87,13 +87,21 @@ before_migrate = "shipstation_integration.setup.setup_custom_fields"
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+doc_events = {
+	"Address": {
+		"validate": "shipstation_integration.customer.clear_address_hash",
+	},
+	"Item": {
+		"on_update": "shipstation_integration.items.invalidate_item_code_cache",
+		"on_trash": "shipstation_integration.items.invalidate_item_code_cache",
+		"after_rename": "shipstation_integration.items.invalidate_item_code_cache",
+	},
+	"Warehouse": {
+		"on_update": "shipstation_integration.shipstation_integration.doctype.shipstation_settings.shipstation_settings.clear_active_warehouse_ids",
+		"on_trash": "shipstation_integration.shipstation_integration.doctype.shipstation_settings.shipstation_settings.clear_active_warehouse_ids",
+		"after_rename": "shipstation_integration.shipstation_integration.doctype.shipstation_settings.shipstation_settings.clear_active_warehouse_ids",
+	},
+}
 
 # Scheduled Tasks
 # ---------------
@@ -102,7 +110,16 @@ scheduler_events = {
 	"hourly_long": [
 		"shipstation_integration.orders.list_orders",
 		"shipstation_integration.shipments.list_shipments",
-	]
+	],
+	"daily_long": [
+		"shipstation_integration.webhooks.poll_orders",
+		"shipstation_integration.webhooks.poll_shipments",
+	],
+}
+
+# sync logs are cleared after the number of days set in Log Settings
+default_log_clearing_doctypes = {
+	"Shipstation Sync Log": 30,
 }
 
 # Testing
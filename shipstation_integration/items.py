@@ -1,9 +1,12 @@
-from typing import TYPE_CHECKING, Optional
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Iterable, Optional
 
 import frappe
 from frappe.utils import flt
 from shipstation.models import ShipStationItem, ShipStationOrderItem
 
+from shipstation_integration.extensions import HookRegistry
+
 if TYPE_CHECKING:
 	from erpnext.stock.doctype.item.item import Item
 
@@ -15,19 +18,128 @@ if TYPE_CHECKING:
 	)
 
 
+# maximum number of SKUs and item names to keep item codes for during a sync run
+ITEM_CACHE_SIZE = 4096
+
+
+class ItemCodeCache:
+	"""
+	A least-recently-used map of Shipstation SKUs and item names to item codes.
+	"""
+
+	def __init__(self, maxsize: int = ITEM_CACHE_SIZE):
+		self.maxsize = maxsize
+		self.item_codes: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+	def get(self, key: tuple[str, str]) -> str | None:
+		item_code = self.item_codes.get(key)
+		if item_code:
+			self.item_codes.move_to_end(key)
+		return item_code
+
+	def set(self, key: tuple[str, str], item_code: str):
+		self.item_codes[key] = item_code
+		self.item_codes.move_to_end(key)
+		if len(self.item_codes) > self.maxsize:
+			self.item_codes.popitem(last=False)
+
+	def invalidate(self, item_code: str | None = None):
+		if not item_code:
+			self.item_codes.clear()
+			return
+
+		for key in [key for key, value in self.item_codes.items() if value == item_code]:
+			del self.item_codes[key]
+
+
+def get_item_code_cache() -> ItemCodeCache:
+	# `frappe.local` is reset for every job and request, which scopes the cache to a sync run
+	if not hasattr(frappe.local, "shipstation_item_codes"):
+		frappe.local.shipstation_item_codes = ItemCodeCache()
+	return frappe.local.shipstation_item_codes
+
+
+def get_stock_uom_cache() -> dict[str, str | None]:
+	if not hasattr(frappe.local, "shipstation_stock_uoms"):
+		frappe.local.shipstation_stock_uoms = {}
+	return frappe.local.shipstation_stock_uoms
+
+
+def get_stock_uoms(item_names: Iterable[str]) -> dict[str, str | None]:
+	"""
+	Get the stock UOMs for a set of item names, querying only the names that
+	haven't been looked up yet in this run.
+
+	Returns:
+		dict: a map of the item name to its stock UOM, or `None` if no item was found
+	"""
+
+	cache = get_stock_uom_cache()
+	missing_names = list({item_name for item_name in item_names if item_name not in cache})
+
+	if missing_names:
+		# ordered like `frappe.db.get_value`, which picks the most recently modified match
+		for item_name, stock_uom in frappe.get_all(
+			"Item",
+			filters={"item_name": ["in", missing_names]},
+			fields=["item_name", "stock_uom"],
+			order_by="modified desc",
+			as_list=True,
+		):
+			cache.setdefault(item_name, stock_uom)
+
+		for item_name in missing_names:
+			cache.setdefault(item_name, None)
+
+	return cache
+
+
+def invalidate_item_code_cache(doc: "Item", method: str | None = None, *args, **kwargs):
+	if hasattr(frappe.local, "shipstation_stock_uoms"):
+		frappe.local.shipstation_stock_uoms.pop(doc.item_name, None)
+
+	if not hasattr(frappe.local, "shipstation_item_codes"):
+		return
+
+	if method == "after_rename":
+		frappe.local.shipstation_item_codes.invalidate()
+	else:
+		frappe.local.shipstation_item_codes.invalidate(doc.name)
+
+
+def get_item_cache_key(product: ShipStationItem | ShipStationOrderItem) -> tuple[str, str]:
+	if product.sku:
+		return "item_code", product.sku.strip()
+	return "item_name", product.name[:140].strip()
+
+
+def get_item_code(product: ShipStationItem | ShipStationOrderItem) -> str | None:
+	key = get_item_cache_key(product)
+	cache = get_item_code_cache()
+	item_code = cache.get(key)
+	if not item_code:
+		item_code = frappe.db.get_value("Item", {key[0]: key[1]})
+		if item_code:
+			cache.set(key, item_code)
+
+	return item_code
+
+
 def create_item(
 	product: ShipStationItem | ShipStationOrderItem,
 	settings: "ShipstationSettings",
 	store: Optional["ShipstationStore"] = None,
+	hooks: HookRegistry | None = None,
 ) -> str:
 	item_name = product.name[:140]
-	if not product.sku:
-		item_code = frappe.db.get_value("Item", {"item_name": item_name.strip()})
-	else:
-		item_code = frappe.db.get_value("Item", {"item_code": product.sku.strip()})
-		item_name = frappe.db.get_value("Item", item_code, "item_name") or item_name
+	item_code = get_item_code(product)
+	before_save_hook = (hooks or HookRegistry()).get("update_shipstation_item_before_save")
 
 	if item_code:
+		item: "Item" = frappe.get_cached_doc("Item", item_code)
+		if not before_save_hook and not has_item_changes(item, store):
+			return item
+
 		item: "Item" = frappe.get_doc("Item", item_code)
 	else:
 		weight_per_unit, weight_uom = 1.0, "Ounce"
@@ -58,6 +170,9 @@ def create_item(
 			}
 		)
 
+	# keep a copy of the existing values, to only save the item if anything changes
+	original_values = None if item.is_new() else item.as_dict(no_default_fields=True)
+
 	if item.disabled:
 		# override disabled status to be able to add the item to the order
 		item.disabled = False
@@ -92,9 +207,32 @@ def create_item(
 				],
 			)
 
-	before_save_hook = frappe.get_hooks("update_shipstation_item_before_save")
 	if before_save_hook:
-		item = frappe.get_attr(before_save_hook[0])(store, item)
+		item = before_save_hook(store, item)
+
+	if item.is_new() or item.as_dict(no_default_fields=True) != original_values:
+		item.save()
+		get_item_code_cache().set(get_item_cache_key(product), item.name)
 
-	item.save()
 	return item
+
+
+def has_item_changes(item: "Item", store: Optional["ShipstationStore"] = None) -> bool:
+	"""
+	Check if syncing a Shipstation product would change an existing item.
+	"""
+
+	if item.disabled:
+		return True
+
+	if not store:
+		return False
+
+	if (
+		item.get("integration_doctype") != "Shipstation Settings"
+		or item.get("integration_doc") != store.parent
+		or item.get("store") != store.name
+	):
+		return True
+
+	return bool(store.company and not item.get("item_defaults"))
@@ -1,17 +1,27 @@
 import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING, Union
 
 import frappe
 from erpnext.stock.doctype.item.item import get_uom_conv_factor
-from frappe.utils import flt, getdate
-from httpx import HTTPError
+from frappe.utils import cint, flt, get_datetime, getdate
 
+from shipstation_integration import telemetry
+from shipstation_integration.commits import batched_commits, commit
+from shipstation_integration.context import SyncContext
 from shipstation_integration.customer import (
 	create_customer,
 	get_billing_address,
 	update_customer_details,
 )
+from shipstation_integration.extensions import HookRegistry
+from shipstation_integration.fetch import PageStream
 from shipstation_integration.items import create_item
+from shipstation_integration.shipstation_integration.doctype.shipstation_store.shipstation_store import (
+	get_shipstation_now,
+)
+from shipstation_integration.telemetry import Profiler, SyncLog
 
 if TYPE_CHECKING:
 	from erpnext.selling.doctype.sales_order.sales_order import SalesOrder
@@ -30,78 +40,272 @@ def list_orders(
 	last_order_datetime: datetime.datetime = None,
 ):
 	if not settings:
-		settings = frappe.get_all("Shipstation Settings", filters={"enabled": True})
+		# accounts using webhooks are polled separately, at a lower frequency
+		settings = frappe.get_all(
+			"Shipstation Settings", filters={"enabled": True, "enable_webhooks": False}
+		)
 	elif not isinstance(settings, list):
 		settings = [settings]
 
+	context = SyncContext()
+	executors: list[ThreadPoolExecutor] = []
+	stream = PageStream()
+	fetches: dict[str, tuple["ShipstationSettings", "ShipstationStore", dict]] = {}
+	logs: dict[str, SyncLog] = {}
+	profiler: Profiler | None = None
+	profiled_log: SyncLog | None = None
+
 	for sss in settings:
 		sss_doc: "ShipstationSettings" = frappe.get_doc("Shipstation Settings", sss.name)
 		if not sss_doc.enabled:
 			continue
 
+		# the whole run is profiled, and the profile is attached to the first
+		# log of an account that has profiling enabled
+		if sss_doc.enable_profiling and not profiler:
+			profiler = Profiler().start()
+
+		context.add_settings(sss_doc)
 		client = sss_doc.client()
 		client.timeout = 60
 
-		if not last_order_datetime:
-			# get data for the last day, Shipstation API behaves oddly when it's a shorter period
-			last_order_datetime = datetime.datetime.utcnow() - datetime.timedelta(
-				hours=sss_doc.get("hours_to_fetch", 500)
-			)
+		# get data for the last day, Shipstation API behaves oddly when it's a shorter period
+		default_order_datetime = get_shipstation_now() - datetime.timedelta(
+			hours=sss_doc.get("hours_to_fetch", 500)
+		)
+
+		# each account gets its own pool, so a slow account or marketplace
+		# doesn't hold up the fetches for the others
+		executor = ThreadPoolExecutor(
+			max_workers=max(cint(sss_doc.get("max_concurrent_requests")), 1),
+			thread_name_prefix="shipstation_orders",
+		)
+		executors.append(executor)
 
 		store: "ShipstationStore"
 		for store in sss_doc.shipstation_stores:
 			if not store.enable_orders:
 				continue
 
+			# only fetch orders modified since the last successful sync for the store
 			parameters = {
 				"store_id": store.store_id,
-				"modify_date_start": last_order_datetime,
-				"modify_date_end": datetime.datetime.utcnow(),
+				"modify_date_start": last_order_datetime
+				or store.get_sync_start("last_order_sync", default_order_datetime),
+				"modify_date_end": get_shipstation_now(),
 			}
 
-			update_parameter_hook = frappe.get_hooks("update_shipstation_list_order_parameters")
+			update_parameter_hook = context.hooks.get("update_shipstation_list_order_parameters")
 			if update_parameter_hook:
-				parameters = frappe.get_attr(update_parameter_hook[0])(parameters)
+				parameters = update_parameter_hook(parameters)
+
+			log = logs[store.name] = SyncLog("Orders", sss_doc.name, store)
+			if sss_doc.enable_profiling and not profiled_log:
+				profiled_log = log
+			log.set_window(parameters.get("modify_date_start"), parameters.get("modify_date_end"))
+
+			fetches[store.name] = (sss_doc, store, parameters)
+			stream.submit(executor, store.name, log.timed_api(client.list_orders), parameters)
+
+	# only the API calls run in the pool; orders are processed on this thread,
+	# which owns the database connection, and each page is committed and
+	# dropped before the next one is processed
+	try:
+		wait_start = time.perf_counter()
+		for store_name, orders, error in stream:
+			sss_doc, store, parameters = fetches[store_name]
+			log = logs[store_name]
+			log.add_phase_time("fetch", time.perf_counter() - wait_start)
+
+			if error:
+				log.fail(str(error))
+				frappe.log_error(title="Error while fetching Shipstation orders", message=error)
+			elif orders is not None:
+				with log.recording(), batched_commits():
+					process_orders(sss_doc, store, orders, context)
+			elif log.counts["failed"]:
+				# leave the cursor where it is, so the failed orders are retried on the next run
+				frappe.db.commit()
+			else:
+				# commits any orders still pending in the batch, along with the cursor
+				store.advance_sync_cursor(
+					"last_order_sync",
+					get_datetime(parameters.get("modify_date_start")),
+					get_datetime(parameters.get("modify_date_end")),
+				)
+
+			wait_start = time.perf_counter()
+	except Exception:
+		# keep a record of the failed run, without the changes still pending in the batch
+		frappe.db.rollback()
+		for log in logs.values():
+			log.fail(log.error or frappe.get_traceback())
+		raise
+	finally:
+		stream.close()
+		for executor in executors:
+			executor.shutdown(cancel_futures=True)
+
+		for log in logs.values():
+			log.save()
+		if profiler:
+			profiler.save(profiled_log)
+
+	context.save_new_options()
+	frappe.db.commit()
 
-			try:
-				orders = client.list_orders(parameters=parameters)
-			except HTTPError as e:
-				frappe.log_error(title="Error while fetching Shipstation orders", message=e)
-				continue
 
-			order: "ShipStationOrder"
-			for order in orders:
-				if validate_order(sss_doc, order, store):
-					should_create_order = True
-					process_order_hook = frappe.get_hooks("process_shipstation_order")
-					if process_order_hook:
-						should_create_order = frappe.get_attr(process_order_hook[0])(order, store)
+def process_orders(
+	settings: "ShipstationSettings",
+	store: "ShipstationStore",
+	orders: list["ShipStationOrder"],
+	context: SyncContext | None = None,
+) -> int:
+	"""
+	Create Sales Orders for a batch of Shipstation orders, and update the status
+	of the ones that already exist.
+
+	Returns:
+		int: the number of existing Sales Orders that had their status updated
+	"""
+
+	if not context:
+		context = SyncContext()
+		context.add_settings(settings)
+
+	commit_batch = context.get_commit_batch(settings.name)
+	existing_orders = get_existing_orders([order.order_id for order in orders if order])
+	status_updates: dict[tuple[str, int], list[str]] = {}
+	process_order_hook = context.hooks.get("process_shipstation_order")
+
+	failed_orders = commit_batch.failed
+	telemetry.count("fetched", len([order for order in orders if order]))
+
+	order: "ShipStationOrder"
+	for order in orders:
+		with telemetry.phase("validate"):
+			is_valid = validate_order(
+				settings, order, store, existing_orders, status_updates, hooks=context.hooks
+			)
+
+		if not is_valid:
+			if order:
+				telemetry.count("skipped")
+			continue
+
+		with commit_batch.savepoint(f"Error while creating Shipstation order {order.order_id}"):
+			should_create_order = True
+			if process_order_hook:
+				should_create_order = process_order_hook(order, store)
+
+			if should_create_order:
+				so_name = create_erpnext_order(order, store, context)
+				if so_name:
+					# guard against the same order showing up twice in a batch
+					existing_orders[str(order.order_id)] = (so_name, None)
+					telemetry.count("created")
+
+	with telemetry.phase("save"):
+		updated_orders = update_order_statuses(status_updates)
+
+	telemetry.count("updated", updated_orders)
+	telemetry.count("failed", commit_batch.failed - failed_orders)
+	commit()
+	return updated_orders
+
+
+def get_existing_orders(order_ids: list[int | str]) -> dict[str, tuple[str, str]]:
+	"""
+	Look up the Sales Orders for a batch of Shipstation order IDs in a single query.
+
+	Returns:
+		dict: a map of the Shipstation order ID to the Sales Order's name and status
+	"""
+
+	if not order_ids:
+		return {}
+
+	sales_orders = frappe.get_all(
+		"Sales Order",
+		filters={"shipstation_order_id": ["in", [str(order_id) for order_id in order_ids]]},
+		fields=["shipstation_order_id", "name", "status"],
+		as_list=True,
+	)
+
+	existing_orders = {}
+	for order_id, name, status in sales_orders:
+		existing_orders.setdefault(order_id, (name, status))
+	return existing_orders
 
-					if should_create_order:
-						create_erpnext_order(order, store)
+
+def update_order_statuses(status_updates: dict[tuple[str, int], list[str]]) -> int:
+	"""
+	Apply status changes to existing Sales Orders, with one update query per status.
+
+	Args:
+		status_updates (dict): a map of the new status and docstatus to the Sales Orders to update
+
+	Returns:
+		int: the number of Sales Orders that were updated
+	"""
+
+	SalesOrder = frappe.qb.DocType("Sales Order")
+
+	updated_orders = 0
+	for (status, docstatus), sales_orders in status_updates.items():
+		if not sales_orders:
+			continue
+
+		changed_orders = (
+			frappe.qb.from_(SalesOrder)
+			.select(SalesOrder.name)
+			.where(SalesOrder.name.isin(sales_orders))
+			.where(SalesOrder.status != status)
+		).run(pluck=True)
+		if not changed_orders:
+			continue
+
+		(
+			frappe.qb.update(SalesOrder)
+			.set(SalesOrder.status, status)
+			.set(SalesOrder.docstatus, docstatus)
+			.where(SalesOrder.name.isin(changed_orders))
+		).run()
+
+		# the update skips the document cache, so drop any cached copies of the orders
+		for sales_order in changed_orders:
+			frappe.clear_document_cache("Sales Order", sales_order)
+		updated_orders += len(changed_orders)
+
+	return updated_orders
 
 
 def validate_order(
 	settings: "ShipstationSettings",
 	order: "ShipStationOrder",
 	store: "ShipstationStore",
+	existing_orders: dict[str, tuple[str, str]] | None = None,
+	status_updates: dict[tuple[str, int], list[str]] | None = None,
+	hooks: HookRegistry | None = None,
 ):
 	if not order:
 		return False
 
+	if existing_orders is None:
+		existing_orders = get_existing_orders([order.order_id])
+
 	# if an order already exists, skip, unless the status needs to be updated
-	existing_order = frappe.db.get_value(
-		"Sales Order",
-		{"shipstation_order_id": order.order_id},
-		["name", "status"],
-		as_dict=True
-	)
+	existing_order = existing_orders.get(str(order.order_id))
 	if existing_order:
+		existing_name, existing_status = existing_order
 		new_status, new_docstatus = get_erpnext_status(order.order_status)
-		if existing_order.status != new_status:
+		if existing_status != new_status and status_updates is not None:
+			# collected to be applied to the whole batch at once
+			status_updates.setdefault((new_status, new_docstatus), []).append(existing_name)
+		elif existing_status != new_status:
 			frappe.db.set_value(
 				"Sales Order",
-				existing_order.name,
+				existing_name,
 				{
 					"status": new_status,
 					"docstatus": new_docstatus
@@ -112,10 +316,8 @@ def validate_order(
 
 	# only create orders for warehouses defined in Shipstation Settings;
 	# if no warehouses are set, fetch everything
-	if (
-		settings.active_warehouse_ids
-		and order.advanced_options.warehouse_id not in settings.active_warehouse_ids
-	):
+	active_warehouse_ids = settings.active_warehouse_ids
+	if active_warehouse_ids and order.advanced_options.warehouse_id not in active_warehouse_ids:
 		return False
 
 	# if a date filter is set in Shipstation Settings, don't create orders before that date
@@ -125,22 +327,41 @@ def validate_order(
 	# allow other apps to run validations on Shipstation-Amazon or Shipstation-Shopify
 	# orders; if an order already exists, stop process flow
 	process_hook = None
-	if store.get("is_amazon_store"):
-		process_hook = frappe.get_hooks("process_shipstation_amazon_order")
-	elif store.get("is_shopify_store"):
-		process_hook = frappe.get_hooks("process_shipstation_shopify_order")
+	if store.get("is_amazon_store") or store.get("is_shopify_store"):
+		hooks = hooks or HookRegistry()
+		if store.get("is_amazon_store"):
+			process_hook = hooks.get("process_shipstation_amazon_order")
+		else:
+			process_hook = hooks.get("process_shipstation_shopify_order")
 
 	if process_hook:
-		existing_order: Union["SalesOrder", bool] = frappe.get_attr(process_hook[0])(
-			store, order, update_customer_details
-		)
+		existing_order: Union["SalesOrder", bool] = process_hook(store, order, update_customer_details)
 		return not existing_order
 
 	return True
 
 
-def create_erpnext_order(order: "ShipStationOrder", store: "ShipstationStore") -> str | None:
-	customer, shipping_address, billing_address = create_customer(order)
+def create_erpnext_order(
+	order: "ShipStationOrder",
+	store: "ShipstationStore",
+	context: SyncContext | None = None,
+) -> str | None:
+	if context:
+		return _create_erpnext_order(order, store, context)
+
+	# outside of a sync run, register any new options as soon as the order is created
+	context = SyncContext()
+	try:
+		return _create_erpnext_order(order, store, context)
+	finally:
+		context.save_new_options()
+
+
+def _create_erpnext_order(
+	order: "ShipStationOrder", store: "ShipstationStore", context: SyncContext
+) -> str | None:
+	with telemetry.phase("customer"):
+		customer, shipping_address, billing_address = create_customer(order)
 	status, docstatus = get_erpnext_status(order.order_status)
 	so: "SalesOrder" = frappe.new_doc("Sales Order")
 	so.update(
@@ -167,22 +388,22 @@ def create_erpnext_order(order: "ShipStationOrder", store: "ShipstationStore") -
 	)
 
 	if store.get("is_amazon_store"):
-		update_hook = frappe.get_hooks("update_shipstation_amazon_order")
+		update_hook = context.hooks.get("update_shipstation_amazon_order")
 		if update_hook:
-			so = frappe.get_attr(update_hook[0])(store, order, so)
+			so = update_hook(store, order, so)
 	elif store.get("is_shopify_store"):
-		update_hook = frappe.get_hooks("update_shipstation_shopify_order")
+		update_hook = context.hooks.get("update_shipstation_shopify_order")
 		if update_hook:
-			so = frappe.get_attr(update_hook[0])(store, order, so)
+			so = update_hook(store, order, so)
 
 	# using `hasattr` over `getattr` to use type annotations
 	order_items = order.items if hasattr(order, "items") else []
 	if not order_items:
 		return
 
-	process_order_items_hook = frappe.get_hooks("process_shipstation_order_items")
+	process_order_items_hook = context.hooks.get("process_shipstation_order_items")
 	if process_order_items_hook:
-		order_items = frappe.get_attr(process_order_items_hook[0])(order_items)
+		order_items = process_order_items_hook(order_items)
 
 	discount_amount = 0.0
 	for item in order_items:
@@ -197,8 +418,9 @@ def create_erpnext_order(order: "ShipStationOrder", store: "ShipstationStore") -
 			discount_amount += abs(rate * item.quantity)
 			continue
 
-		settings = frappe.get_doc("Shipstation Settings", store.parent)
-		stock_item = create_item(item, settings=settings, store=store)
+		settings = context.get_settings(store.parent)
+		with telemetry.phase("item"):
+			stock_item = create_item(item, settings=settings, store=store, hooks=context.hooks)
 		uom = stock_item.sales_uom or stock_item.stock_uom
 		conversion_factor = (
 			1 if uom == stock_item.stock_uom else get_uom_conv_factor(uom, stock_item.stock_uom)
@@ -215,29 +437,14 @@ def create_erpnext_order(order: "ShipStationOrder", store: "ShipstationStore") -
 			"shipstation_item_notes": item_notes,
 		}
 
-		shipstation_options = frappe.get_all(
-			"Shipstation Option",
-			filters={"parent": store.parent},
-			fields=["shipstation_option_name", "item_field"],
-		)
-
-		# check to see if the option exists in the Options Import table, otherwise add it
+		# check to see if the option exists in the Options Import table, otherwise
+		# queue it to be added at the end of the run
+		option_map = context.get_option_map(store.parent)
 		for option in item.options:
-			option_import = next(
-				(
-					ss_option
-					for ss_option in shipstation_options
-					if ss_option.shipstation_option_name == option.name
-				),
-				None,
-			)
-
-			if option_import:
-				if option_import.item_field:
-					item_dict[option_import.item_field] = option.value
-			else:
-				settings.append("shipstation_options", {"shipstation_option_name": option.name})
-				settings.save()
+			if option.name not in option_map:
+				context.add_option(store.parent, option.name)
+			elif option_map[option.name]:
+				item_dict[option_map[option.name]] = option.value
 
 		so.append("items", item_dict)
 
@@ -274,20 +481,22 @@ def create_erpnext_order(order: "ShipStationOrder", store: "ShipstationStore") -
 		so.apply_discount_on = "Grand Total"
 		so.discount_amount = discount_amount
 
-	so.save()
-
-	before_submit_hook = frappe.get_hooks("update_shipstation_order_before_submit")
-	if before_submit_hook:
-		so = frappe.get_attr(before_submit_hook[0])(store, so)
+	with telemetry.phase("save"):
 		so.save()
 
-	match docstatus:
-		case 1:
-			so.submit()
-		case 2:
-			so.cancel()
-	
-	frappe.db.commit()
+		before_submit_hook = context.hooks.get("update_shipstation_order_before_submit")
+		if before_submit_hook:
+			so = before_submit_hook(store, so)
+			so.save()
+
+	with telemetry.phase("submit"):
+		match docstatus:
+			case 1:
+				so.submit()
+			case 2:
+				so.cancel()
+
+	commit()
 	return so.name
 
 
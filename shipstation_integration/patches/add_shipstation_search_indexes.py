@@ -0,0 +1,5 @@
+from shipstation_integration.setup import create_search_indexes
+
+
+def execute():
+	create_search_indexes()
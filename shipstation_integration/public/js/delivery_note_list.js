@@ -0,0 +1,14 @@
+// extend ERPNext's list settings for Delivery Note, since list scripts are merged together
+{
+	const settings = (frappe.listview_settings["Delivery Note"] =
+		frappe.listview_settings["Delivery Note"] || {});
+	const onload = settings.onload;
+
+	settings.onload = (listview) => {
+		if (onload) onload(listview);
+
+		listview.page.add_actions_menu_item(__("Create Shipping Labels"), () => {
+			shipping.bulk_label_dialog(listview);
+		});
+	};
+}
@@ -137,17 +137,222 @@ shipping.create_shipping_label = (frm, values) => {
   frappe.call({
     method: "shipstation_integration.shipping.create_shipping_label",
     args: { doc: frm.doc, values: values },
-    freeze: true,
     callback: (r) => {
-      if (!r.exc) {
-        frm.reload_doc();
-      }
+      if (r.exc || !r.message) return;
+
+      // the job runs for up to 5 minutes, plus however long it waits in the queue
+      shipping.follow_label_job(r.message, __("Creating Shipping Label"), 15, (job) => {
+        if (job.status === "Failed") {
+          frappe.msgprint({
+            title: __("Shipping Label"),
+            message: job.error,
+            indicator: "red",
+          });
+        } else if (frm.doc.name in job.labels) {
+          frm.reload_doc();
+        }
+      });
     },
   });
 };
 
+shipping.follow_label_job = (label_job, title, timeout_minutes, on_finish) => {
+  // progress is pushed over realtime, with polling as a fallback in case the
+  // socket isn't connected or an update is missed
+  let finished = false;
+  let poll;
+  let timeout;
+
+  const finish = (job) => {
+    finished = true;
+    frappe.realtime.off("shipstation_label_job", update);
+    clearInterval(poll);
+    clearTimeout(timeout);
+    frappe.hide_progress();
+    on_finish(job);
+  };
+
+  const fail = (error) => {
+    finish({ label_job: label_job, status: "Failed", error: error, labels: {}, errors: {} });
+  };
+
+  const update = (job) => {
+    if (finished || !job || job.label_job !== label_job) return;
+
+    if (["Finished", "Failed"].includes(job.status)) {
+      finish(job);
+    } else {
+      frappe.show_progress(title, job.completed, job.total, __(job.status), true);
+    }
+  };
+
+  frappe.realtime.on("shipstation_label_job", update);
+  poll = setInterval(() => {
+    frappe.call({
+      method: "shipstation_integration.shipping.get_label_job",
+      args: { label_job: label_job },
+      callback: (r) => {
+        if (finished) return;
+
+        // the job is gone from the cache once it expires, e.g. if its worker died
+        if (!r.message) {
+          fail(__("The label job is no longer running. Please check the labels and try again."));
+        } else {
+          update(r.message);
+        }
+      },
+    });
+  }, 5000);
+
+  timeout = setTimeout(() => {
+    if (!finished) {
+      fail(__("The label job is taking too long. Please check the labels and try again."));
+    }
+  }, timeout_minutes * 60 * 1000);
+};
+
 shipping.get_label_warnings = (frm) => {
   return frm.doc.customer_address
     ? ""
     : `<p style="color: red;">A customer address is required to create a label.</p>`;
 };
+
+shipping.bulk_label_dialog = (listview) => {
+  const delivery_notes = listview.get_checked_items(true);
+  if (!delivery_notes.length) {
+    frappe.throw(__("Please select at least one Delivery Note"));
+  }
+
+  frappe.call({
+    method: "shipstation_integration.shipping.get_bulk_label_settings",
+    args: { delivery_notes: delivery_notes },
+    callback: (r) => {
+      if (!r.message) {
+        shipping.show_bulk_label_dialog(delivery_notes, []);
+        return;
+      }
+
+      frappe.call({
+        method: "shipstation_integration.shipping.get_carrier_services",
+        args: { settings: r.message },
+        callback: (services) => {
+          shipping.show_bulk_label_dialog(delivery_notes, services.message || []);
+        },
+      });
+    },
+  });
+};
+
+shipping.show_bulk_label_dialog = (delivery_notes, carrier_options) => {
+  const options = carrier_options.map((a) => a.nickname || a.name).join("\n");
+
+  const dialog = new frappe.ui.Dialog({
+    title: __("Create Shipping Labels for {0} Delivery Notes", [
+      delivery_notes.length,
+    ]),
+    fields: [
+      {
+        fieldname: "ship_method_type",
+        fieldtype: "Select",
+        label: "Carrier",
+        options: options,
+        hidden: !carrier_options.length,
+        description: __(
+          "Leave blank to use the carrier and service set on each Shipstation order."
+        ),
+        onchange: () => {
+          const values = dialog.get_values(true);
+          const carrier = carrier_options.find(
+            (a) => (a.nickname || a.name) === values.ship_method_type
+          );
+          if (carrier) {
+            dialog.set_df_property(
+              "package",
+              "options",
+              carrier.packages.map((a) => a.name).join("\n")
+            );
+            dialog.set_df_property(
+              "service",
+              "options",
+              carrier.services.map((a) => a.name).join("\n")
+            );
+          }
+        },
+      },
+      {
+        fieldname: "service",
+        fieldtype: "Select",
+        label: "Service",
+        depends_on: "ship_method_type",
+      },
+      {
+        fieldname: "package",
+        fieldtype: "Select",
+        label: "Package Type",
+        depends_on: "ship_method_type",
+      },
+      { fieldname: "cb_label", fieldtype: "Column Break" },
+      {
+        fieldname: "gross_weight",
+        fieldtype: "Float",
+        label: __("Gross Weight (lb)"),
+        description: __(
+          "Leave blank to use each Delivery Note's total net weight, converted to pounds."
+        ),
+      },
+    ],
+    primary_action_label: __("Create Labels"),
+    primary_action: () => {
+      dialog.hide();
+      shipping.create_shipping_labels(delivery_notes, dialog.get_values(true));
+    },
+  });
+
+  dialog.show();
+};
+
+shipping.create_shipping_labels = (delivery_notes, values) => {
+  frappe.call({
+    method: "shipstation_integration.shipping.create_shipping_labels",
+    args: { delivery_notes: delivery_notes, values: values },
+    callback: (r) => {
+      if (r.exc || !r.message) return;
+
+      // the job runs for up to an hour, plus however long it waits in the queue
+      shipping.follow_label_job(
+        r.message,
+        __("Creating Shipping Labels"),
+        75,
+        shipping.show_bulk_label_result
+      );
+    },
+  });
+};
+
+shipping.show_bulk_label_result = (data) => {
+  const created = Object.keys(data.labels || {}).length;
+  const errors = Object.entries(data.errors || {});
+
+  let message = `<p>${__("Created {0} shipping label(s).", [created])}</p>`;
+  if (data.error) {
+    message += `<p>${frappe.utils.escape_html(data.error)}</p>`;
+  }
+  if (data.merged_file) {
+    message += `<p><a href="${data.merged_file}" target="_blank">${__(
+      "Download the labels for printing"
+    )}</a></p>`;
+  }
+  if (errors.length) {
+    message += `<p>${__("The following labels could not be created:")}</p><ul>`;
+    message += errors
+      .map(([name, error]) => `<li><b>${name}</b>: ${frappe.utils.escape_html(error)}</li>`)
+      .join("");
+    message += "</ul>";
+  }
+
+  frappe.msgprint({
+    title: __("Shipping Labels"),
+    message: message,
+    indicator: data.error || errors.length ? "orange" : "green",
+  });
+};
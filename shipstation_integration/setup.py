@@ -3,6 +3,18 @@ from frappe import _
 from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
 from frappe.custom.doctype.property_setter.property_setter import make_property_setter
 
+# Shipstation ID fields that the sync filters on, which need to be indexed
+SEARCH_INDEX_FIELDS = {
+	"Sales Order": ["shipstation_order_id", "marketplace_order_id"],
+	"Sales Order Item": ["shipstation_order_item_id"],
+	"Sales Invoice": ["shipstation_order_id", "marketplace_order_id", "shipstation_shipment_id"],
+	"Sales Invoice Item": ["shipstation_order_item_id"],
+	"Delivery Note": ["shipstation_order_id", "marketplace_order_id", "shipstation_shipment_id"],
+	"Delivery Note Item": ["shipstation_order_item_id"],
+	"Shipment": ["shipstation_order_id", "marketplace_order_id"],
+	"Address": ["shipstation_address_hash"],
+}
+
 
 def get_setup_stages(args=None):
 	return [
@@ -112,6 +124,20 @@ def setup_custom_fields():
 		)
 	]
 
+	address_fields = [
+		dict(
+			fieldtype="Data",
+			fieldname="shipstation_address_hash",
+			hidden=True,
+			read_only=True,
+			label="Shipstation Address Hash",
+			insert_after="disabled",
+			search_index=True,
+			translatable=False,
+			no_copy=True,
+		)
+	]
+
 	common_custom_sales_fields = [
 		dict(
 			fieldtype="Data",
@@ -128,6 +154,7 @@ def setup_custom_fields():
 			label="Shipstation Order ID",
 			insert_after="shipstation_store_name",
 			in_standard_filter=True,
+			search_index=True,
 			translatable=False,
 		),
 		dict(
@@ -149,6 +176,7 @@ def setup_custom_fields():
 			read_only=True,
 			label="Marketplace Order ID",
 			insert_after="marketplace",
+			search_index=True,
 			translatable=False,
 		),
 		dict(
@@ -204,6 +232,7 @@ def setup_custom_fields():
 			read_only=True,
 			label="Shipstation Order Item ID",
 			insert_after="sb_shipstation",
+			search_index=True,
 			translatable=False,
 		),
 		dict(
@@ -244,6 +273,7 @@ def setup_custom_fields():
 				read_only=True,
 				label="Shipstation Shipment ID",
 				insert_after="shipstation_order_id",
+				search_index=True,
 				translatable=False,
 			)
 		]
@@ -267,6 +297,7 @@ def setup_custom_fields():
 				read_only=True,
 				label="Shipstation Shipment ID",
 				insert_after="shipstation_order_id",
+				search_index=True,
 				translatable=False,
 			)
 		]
@@ -288,6 +319,7 @@ def setup_custom_fields():
 			label="Shipstation Order ID",
 			insert_after="shipstation_store_name",
 			in_standard_filter=True,
+			search_index=True,
 			translatable=False,
 		),
 		dict(
@@ -304,6 +336,7 @@ def setup_custom_fields():
 			read_only=True,
 			label="Marketplace Order ID",
 			insert_after="marketplace",
+			search_index=True,
 			translatable=False,
 		),
 	]
@@ -311,6 +344,7 @@ def setup_custom_fields():
 	custom_fields = {
 		"Item": item_fields,
 		"Warehouse": warehouse_fields,
+		"Address": address_fields,
 		"Sales Order": sales_order_fields,
 		"Sales Order Item": common_custom_sales_item_fields,
 		"Sales Invoice": sales_invoice_fields,
@@ -320,6 +354,10 @@ def setup_custom_fields():
 		"Shipment": shipment_fields,
 	}
 
+	# build any missing indexes on existing columns before the fields are synced,
+	# otherwise the schema sync adds them with a blocking table rebuild
+	create_search_indexes()
+
 	print("Creating custom fields for Shipstation")
 	create_custom_fields(custom_fields)
 
@@ -367,3 +405,35 @@ def setup_custom_fields():
 			),
 		):
 			make_property_setter(**property_setter)
+
+
+def create_search_indexes():
+	"""
+	Add indexes for the Shipstation ID fields on existing sites, without locking
+	the (potentially large) transaction tables while the index is being built.
+
+	Uses the same index names as Frappe's schema sync, so the sync will skip
+	any index created here.
+	"""
+
+	if frappe.db.db_type != "mariadb":
+		# other databases get their indexes through the regular schema sync
+		return
+
+	for doctype, fieldnames in SEARCH_INDEX_FIELDS.items():
+		for fieldname in fieldnames:
+			if not frappe.db.has_column(doctype, fieldname):
+				continue
+
+			index_name = f"{fieldname}_index"
+			if frappe.db.has_index(f"tab{doctype}", index_name):
+				continue
+
+			print(f"Adding index {index_name} to {doctype}")
+			frappe.db.sql_ddl(
+				f"""
+					ALTER TABLE `tab{doctype}`
+					ADD INDEX `{index_name}`(`{fieldname}`),
+					ALGORITHM=INPLACE, LOCK=NONE
+				"""
+			)
@@ -1,4 +1,5 @@
 import datetime
+from collections.abc import Callable
 from typing import TYPE_CHECKING, Optional
 
 import frappe
@@ -13,6 +14,16 @@ from erpnext.stock.doctype.delivery_note.delivery_note import make_shipment
 from frappe.utils import getdate
 from httpx import HTTPError
 
+from shipstation_integration import telemetry
+from shipstation_integration.commits import batched_commits, commit
+from shipstation_integration.context import SyncContext
+from shipstation_integration.fetch import iter_pages
+from shipstation_integration.items import get_stock_uoms
+from shipstation_integration.shipstation_integration.doctype.shipstation_store.shipstation_store import (
+	get_shipstation_now,
+)
+from shipstation_integration.telemetry import Profiler, SyncLog
+
 if TYPE_CHECKING:
 	from erpnext.accounts.doctype.sales_invoice.sales_invoice import SalesInvoice
 	from erpnext.stock.doctype.delivery_note.delivery_note import DeliveryNote
@@ -32,79 +43,312 @@ def list_shipments(
 	last_shipment_datetime: "datetime.datetime" = None,
 ):
 	if not settings:
-		settings = frappe.get_all("Shipstation Settings", filters={"enabled": True})
+		# accounts using webhooks are polled separately, at a lower frequency
+		settings = frappe.get_all(
+			"Shipstation Settings", filters={"enabled": True, "enable_webhooks": False}
+		)
 	elif not isinstance(settings, list):
 		settings = [settings]
 
-	for sss in settings:
-		sss_doc: "ShipstationSettings" = frappe.get_doc("Shipstation Settings", sss.name)
-		if not sss_doc.enabled:
-			continue
+	context = SyncContext()
+	profiler: Profiler | None = None
+	profiled_log: SyncLog | None = None
 
-		client = sss_doc.client()
-		client.timeout = 60
-
-		if not last_shipment_datetime:
-			# Get data for the last day, Shipstation API behaves oddly when it's a shorter period
-			last_shipment_datetime = datetime.datetime.utcnow() - datetime.timedelta(hours=24)
-
-		store: "ShipstationStore"
-		for store in sss_doc.shipstation_stores:
-			if not store.enable_shipments or not any(
-				[
-					store.create_sales_invoice,
-					store.create_delivery_note,
-					store.create_shipment,
-				]
-			):
+	try:
+		for sss in settings:
+			sss_doc: "ShipstationSettings" = frappe.get_doc("Shipstation Settings", sss.name)
+			if not sss_doc.enabled:
 				continue
 
-			parameters = {
-				"store_id": store.store_id,
-				"create_date_start": last_shipment_datetime,
-				"create_date_end": datetime.datetime.utcnow(),
-				"include_shipment_items": True,
-			}
-
-			try:
-				shipments = client.list_shipments(parameters=parameters)
-			except HTTPError as e:
-				frappe.log_error(title="Error while fetching Shipstation shipment", message=e)
-				continue
+			# the whole run is profiled, and the profile is attached to the first
+			# log of an account that has profiling enabled
+			if sss_doc.enable_profiling and not profiler:
+				profiler = Profiler().start()
+
+			context.add_settings(sss_doc)
+			client = sss_doc.client()
+			client.timeout = 60
 
-			shipment: Optional["ShipStationOrder"]
-			for shipment in shipments:
-				# sometimes Shipstation will return `None` in the response
-				if not shipment:
+			# Get data for the last day, Shipstation API behaves oddly when it's a shorter period
+			default_shipment_datetime = get_shipstation_now() - datetime.timedelta(hours=24)
+
+			store: "ShipstationStore"
+			for store in sss_doc.shipstation_stores:
+				if not store.enable_shipments or not any(
+					[
+						store.create_sales_invoice,
+						store.create_delivery_note,
+						store.create_shipment,
+					]
+				):
 					continue
 
-				# if a date filter is set in Shipstation Settings, don't create orders before that date
-				if sss_doc.since_date and getdate(shipment.create_date) < sss_doc.since_date:
+				# only fetch shipments created or voided since the last successful sync for the store
+				window_start = last_shipment_datetime or store.get_sync_start(
+					"last_shipment_sync", default_shipment_datetime
+				)
+				window_end = get_shipstation_now()
+
+				log = SyncLog("Shipments", sss_doc.name, store)
+				if sss_doc.enable_profiling and not profiled_log:
+					profiled_log = log
+				log.set_window(window_start, window_end)
+
+				try:
+					with log.recording(), batched_commits():
+						sync_store_shipments(
+							context,
+							sss_doc,
+							store,
+							log.timed_api(client.list_shipments),
+							window_start,
+							window_end,
+						)
+				except HTTPError as e:
+					log.fail(str(e))
+					log.save()
+					frappe.log_error(title="Error while fetching Shipstation shipment", message=e)
 					continue
+				except Exception:
+					# keep a record of the failed run, without the changes still pending in the batch
+					frappe.db.rollback()
+					log.fail(frappe.get_traceback())
+					log.save()
+					raise
+
+				if log.counts["failed"]:
+					# leave the cursor where it is, so the failed shipments are retried on the next run
+					frappe.db.commit()
+				else:
+					# commits any shipments still pending in the batch, along with the cursor
+					store.advance_sync_cursor("last_shipment_sync", window_start, window_end)
+				log.save()
+	finally:
+		if profiler:
+			profiler.save(profiled_log)
 
-				if frappe.db.exists(
-					"Delivery Note",
-					{"docstatus": 1, "shipstation_order_id": shipment.order_id},
-				):
-					if shipment.voided:
+
+def sync_store_shipments(
+	context: SyncContext,
+	settings: "ShipstationSettings",
+	store: "ShipstationStore",
+	list_shipments: Callable,
+	window_start: datetime.datetime,
+	window_end: datetime.datetime,
+):
+	for shipments in iter_pages(
+		list_shipments,
+		{
+			"store_id": store.store_id,
+			"create_date_start": window_start,
+			"create_date_end": window_end,
+			"include_shipment_items": True,
+		},
+	):
+		process_shipments(settings, store, shipments, context)
+
+	# shipments created before the window can still be voided within it
+	for shipments in iter_pages(
+		list_shipments,
+		{
+			"store_id": store.store_id,
+			"void_date_start": window_start,
+			"void_date_end": window_end,
+		},
+	):
+		process_voided_shipments(settings, shipments, context)
+
+
+def process_shipments(
+	settings: "ShipstationSettings",
+	store: "ShipstationStore",
+	shipments: list[Optional["ShipStationOrder"]],
+	context: SyncContext | None = None,
+):
+	if not context:
+		context = SyncContext()
+		context.add_settings(settings)
+
+	commit_batch = context.get_commit_batch(settings.name)
+	failed_shipments = commit_batch.failed
+	telemetry.count("fetched", len([shipment for shipment in shipments if shipment]))
+
+	with telemetry.phase("prefetch"):
+		existing = ExistingDocuments(shipments)
+
+		if store.create_shipment:
+			# resolve the stock UOMs for every shipment's contents in one query
+			get_stock_uoms(
+				shipment_item.name
+				for shipment in shipments
+				if shipment and shipment.shipment_items
+				for shipment_item in shipment.shipment_items
+			)
+
+	shipment: Optional["ShipStationOrder"]
+	for shipment in shipments:
+		# sometimes Shipstation will return `None` in the response
+		if not shipment:
+			continue
+
+		# if a date filter is set in Shipstation Settings, don't create orders before that date
+		if settings.since_date and getdate(shipment.create_date) < settings.since_date:
+			telemetry.count("skipped")
+			continue
+
+		with commit_batch.savepoint(f"Error while creating Shipstation shipment {shipment.shipment_id}"):
+			if existing.has_submitted_delivery(shipment.order_id):
+				if shipment.voided:
+					with telemetry.phase("cancel"):
 						cancel_voided_shipments(shipment)
+					telemetry.count("updated")
 				else:
-					create_erpnext_shipment(shipment, store)
+					telemetry.count("skipped")
+			else:
+				create_erpnext_shipment(shipment, store, existing)
+				telemetry.count("created")
+
+	telemetry.count("failed", commit_batch.failed - failed_shipments)
+	commit()
 
 
-def create_erpnext_shipment(shipment: "ShipStationOrder", store: "ShipstationStore"):
+def process_voided_shipments(
+	settings: "ShipstationSettings",
+	shipments: list[Optional["ShipStationOrder"]],
+	context: SyncContext | None = None,
+):
+	if not context:
+		context = SyncContext()
+		context.add_settings(settings)
+
+	commit_batch = context.get_commit_batch(settings.name)
+	failed_shipments = commit_batch.failed
+
+	with telemetry.phase("prefetch"):
+		existing = ExistingDocuments(shipments)
+
+	shipment: Optional["ShipStationOrder"]
+	for shipment in shipments:
+		if shipment and shipment.voided and existing.has_submitted_delivery(shipment.order_id):
+			with commit_batch.savepoint(
+				f"Error while cancelling Shipstation shipment {shipment.shipment_id}"
+			):
+				with telemetry.phase("cancel"):
+					cancel_voided_shipments(shipment)
+				telemetry.count("updated")
+
+	telemetry.count("failed", commit_batch.failed - failed_shipments)
+	commit()
+
+
+class ExistingDocuments:
+	"""
+	The Sales Orders, Sales Invoices and Delivery Notes already created for a page of
+	shipments, looked up with one query per doctype instead of several per shipment.
+	"""
+
+	def __init__(self, shipments: list[Optional["ShipStationOrder"]]):
+		# maps of the Shipstation order ID to the document's name
+		self.sales_orders: dict[str, str] = {}
+		self.sales_invoices: dict[str, str] = {}
+		self.delivery_notes: dict[str, str] = {}
+		# Shipstation order IDs with a submitted Delivery Note
+		self.delivered_orders: set[str] = set()
+		# map of the Shipstation shipment ID to the Delivery Note's name
+		self.shipment_deliveries: dict[str, str] = {}
+
+		order_ids = list({str(shipment.order_id) for shipment in shipments if shipment})
+		shipment_ids = list({str(shipment.shipment_id) for shipment in shipments if shipment})
+		if not order_ids:
+			return
+
+		# ordered like `frappe.db.get_value`, which picks the most recently modified match
+		for doctype, documents in (
+			("Sales Order", self.sales_orders),
+			("Sales Invoice", self.sales_invoices),
+		):
+			for order_id, name in frappe.get_all(
+				doctype,
+				filters={"shipstation_order_id": ["in", order_ids]},
+				fields=["shipstation_order_id", "name"],
+				order_by="modified desc",
+				as_list=True,
+			):
+				documents.setdefault(order_id, name)
+
+		for order_id, name, docstatus, shipment_id in frappe.get_all(
+			"Delivery Note",
+			filters={"shipstation_order_id": ["in", order_ids]},
+			fields=["shipstation_order_id", "name", "docstatus", "shipstation_shipment_id"],
+			order_by="modified desc",
+			as_list=True,
+		):
+			self.delivery_notes.setdefault(order_id, name)
+			if docstatus == 1:
+				self.delivered_orders.add(order_id)
+			if shipment_id:
+				self.shipment_deliveries.setdefault(shipment_id, name)
+
+		# Delivery Notes labelled from the desk have a shipment ID, but may not be linked to an order
+		for shipment_id, name in frappe.get_all(
+			"Delivery Note",
+			filters={"shipstation_shipment_id": ["in", shipment_ids]},
+			fields=["shipstation_shipment_id", "name"],
+			order_by="modified desc",
+			as_list=True,
+		):
+			self.shipment_deliveries.setdefault(shipment_id, name)
+
+	def has_submitted_delivery(self, order_id: str | int) -> bool:
+		return str(order_id) in self.delivered_orders
+
+	def add(
+		self,
+		shipment: "ShipStationOrder",
+		sales_invoice: Optional["SalesInvoice"] = None,
+		delivery_note: Optional["DeliveryNote"] = None,
+	):
+		"""
+		Track the documents created for a shipment, in case its order shows up again in the page.
+		"""
+
+		order_id = str(shipment.order_id)
+		if sales_invoice:
+			self.sales_invoices.setdefault(order_id, sales_invoice.name)
+		if delivery_note:
+			self.delivery_notes.setdefault(order_id, delivery_note.name)
+			if delivery_note.docstatus == 1:
+				self.delivered_orders.add(order_id)
+			if delivery_note.shipstation_shipment_id:
+				self.shipment_deliveries.setdefault(
+					str(delivery_note.shipstation_shipment_id), delivery_note.name
+				)
+
+
+def create_erpnext_shipment(
+	shipment: "ShipStationOrder",
+	store: "ShipstationStore",
+	existing: ExistingDocuments | None = None,
+):
+	if existing is None:
+		existing = ExistingDocuments([shipment])
+
 	sales_invoice = None
 	if store.create_sales_invoice:
-		sales_invoice = create_sales_invoice(shipment, store)
+		with telemetry.phase("sales_invoice"):
+			sales_invoice = create_sales_invoice(shipment, store, existing)
 
 	delivery_note = None
 	if store.create_delivery_note:
-		delivery_note = create_delivery_note(shipment, sales_invoice)
+		with telemetry.phase("delivery_note"):
+			delivery_note = create_delivery_note(shipment, sales_invoice, existing)
 
 	shipment_doc = None
 	if store.create_shipment:
-		shipment_doc = create_shipment(shipment, store, delivery_note)
+		with telemetry.phase("shipment"):
+			shipment_doc = create_shipment(shipment, store, delivery_note, existing)
 
+	existing.add(shipment, sales_invoice, delivery_note)
 	return shipment_doc
 
 
@@ -131,13 +375,20 @@ def cancel_voided_shipments(shipment: "ShipStationOrder"):
 		frappe.get_doc("Sales Invoice", existing_si).cancel()
 
 
-def create_sales_invoice(shipment: "ShipStationOrder", store: "ShipstationStore"):
-	existing_si = frappe.get_value("Sales Invoice", {"shipstation_order_id": shipment.order_id})
+def create_sales_invoice(
+	shipment: "ShipStationOrder",
+	store: "ShipstationStore",
+	existing: ExistingDocuments | None = None,
+):
+	if existing is None:
+		existing = ExistingDocuments([shipment])
+
+	existing_si = existing.sales_invoices.get(str(shipment.order_id))
 
 	if existing_si:
 		return frappe.get_doc("Sales Invoice", existing_si)
 
-	so_name = frappe.get_value("Sales Order", {"shipstation_order_id": shipment.order_id})
+	so_name = existing.sales_orders.get(str(shipment.order_id))
 	if not so_name:
 		return
 
@@ -163,10 +414,14 @@ def create_sales_invoice(shipment: "ShipStationOrder", store: "ShipstationStore"
 
 
 def create_delivery_note(
-	shipment: "ShipStationOrder", sales_invoice: Optional["SalesInvoice"] = None
+	shipment: "ShipStationOrder",
+	sales_invoice: Optional["SalesInvoice"] = None,
+	existing: ExistingDocuments | None = None,
 ):
+	if existing is None:
+		existing = ExistingDocuments([shipment])
 
-	existing_dn = frappe.get_value("Delivery Note", {"shipstation_order_id": shipment.order_id})
+	existing_dn = existing.delivery_notes.get(str(shipment.order_id))
 
 	if existing_dn:
 		return frappe.get_doc("Delivery Note", existing_dn)
@@ -174,7 +429,7 @@ def create_delivery_note(
 	if sales_invoice:
 		dn: "DeliveryNote" = make_delivery_from_invoice(sales_invoice.name)
 	else:
-		so_name = frappe.get_value("Sales Order", {"shipstation_order_id": shipment.order_id})
+		so_name = existing.sales_orders.get(str(shipment.order_id))
 		if not so_name:
 			return
 		dn: "DeliveryNote" = make_delivery_from_order(so_name)
@@ -186,7 +441,7 @@ def create_delivery_note(
 
 	dn.save()
 	dn.submit()
-	frappe.db.commit()
+	commit()
 	return dn
 
 
@@ -194,18 +449,18 @@ def create_shipment(
 	shipment: "ShipStationOrder",
 	store: "ShipstationStore",
 	delivery_note: Optional["DeliveryNote"] = None,
+	existing: ExistingDocuments | None = None,
 ):
 	if delivery_note:
 		shipment_doc: "Shipment" = make_shipment(delivery_note.name)
 	else:
-		shipment_deliveries = frappe.get_all(
-			"Delivery Note",
-			filters={"shipstation_shipment_id": shipment.shipment_id},
-			pluck="name",
-		)
-		if not shipment_deliveries:
+		if existing is None:
+			existing = ExistingDocuments([shipment])
+
+		shipment_delivery = existing.shipment_deliveries.get(str(shipment.shipment_id))
+		if not shipment_delivery:
 			return
-		shipment_doc: "Shipment" = make_shipment(shipment_deliveries[0])
+		shipment_doc: "Shipment" = make_shipment(shipment_delivery)
 
 	shipment_doc.update(
 		{
@@ -226,8 +481,9 @@ def create_shipment(
 
 	if shipment.shipment_items:
 		description = ""
+		stock_uoms = get_stock_uoms(shipment_item.name for shipment_item in shipment.shipment_items)
 		for count, shipment_item in enumerate(shipment.shipment_items, 1):
-			stock_uom = frappe.db.get_value("Item", {"item_name": shipment_item.name}, "stock_uom")
+			stock_uom = stock_uoms.get(shipment_item.name)
 			description += f"{count}. {shipment_item.name} - {shipment_item.quantity} {stock_uom}\n"
 		shipment_doc.update({"description_of_content": description})
 
@@ -253,6 +509,6 @@ def create_shipment(
 
 	shipment_doc.save()
 	shipment_doc.submit()
-	frappe.db.commit()
+	commit()
 
 	return shipment_doc
@@ -1,20 +1,32 @@
 import base64
 import json
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 from io import BytesIO
 from typing import TYPE_CHECKING, NoReturn
 
 import frappe
+from erpnext.stock.doctype.item.item import get_uom_conv_factor
 from frappe import _
 from frappe.contacts.doctype.address.address import Address
-from frappe.utils import get_datetime, get_link_to_form, today
+from frappe.utils import cint, flt, get_datetime, get_link_to_form, now_datetime, today
 from frappe.utils.file_manager import save_file
 from httpx import HTTPError
 from shipstation.models import ShipStationAddress, ShipStationOrder, ShipStationWeight
 
+try:
+	from pypdf import PdfWriter
+except ImportError:
+	# older Frappe versions ship with PyPDF2
+	from PyPDF2 import PdfWriter
+
+from shipstation_integration import telemetry
+from shipstation_integration.carriers import get_carrier_index
 from shipstation_integration.shipments import cancel_voided_shipments, create_erpnext_shipment
+from shipstation_integration.telemetry import SyncLog
 
 if TYPE_CHECKING:
 	from frappe.core.doctype.file.file import File
+	from shipstation import ShipStation
 
 	from shipstation_integration.shipstation_integration.doctype.shipstation_settings.shipstation_settings import (
 		ShipstationSettings,
@@ -24,6 +36,13 @@ if TYPE_CHECKING:
 	)
 
 
+LABEL_FOLDER = "Home/Shipstation Labels"
+# label jobs are only followed while they run, so their progress doesn't need to stick around
+LABEL_JOB_EXPIRY = 60 * 60
+# label weights are sent to Shipstation in pounds
+WEIGHT_UOM = "Pound"
+
+
 @frappe.whitelist()
 def update_carriers_and_stores():  # scheduled daily
 	settings_list: list["ShipstationSettings"] = frappe.get_list("Shipstation Settings")
@@ -31,24 +50,73 @@ def update_carriers_and_stores():  # scheduled daily
 		settings_doc: "ShipstationSettings" = frappe.get_cached_doc(
 			"Shipstation Settings", settings.name
 		)
-		settings_doc.update_carriers_and_stores().save()
-		settings_doc.update_stores().save()
+		# saves the settings only if the carriers or stores changed
+		settings_doc.update_carriers_and_stores(force=False)
 
 
 @frappe.whitelist()
-def create_shipping_label(doc: str, values: str):
+def create_shipping_label(doc: str, values: str) -> str:
+	"""
+	Queue the shipping label for the document, and return the label job's ID to follow its
+	progress with `get_label_job` or the `shipstation_label_job` realtime event.
+	"""
+
 	create_shipping_label_folder()
-	_create_shipping_label(doc, values, user=frappe.session.user)
+	label_job = create_label_job(total=1)
+	frappe.enqueue(
+		"shipstation_integration.shipping.run_label_job",
+		queue="short",
+		timeout=300,
+		label_job=label_job,
+		doc=doc,
+		values=values,
+	)
+	return label_job
+
+
+def run_label_job(label_job: str, doc: str, values: str):
+	log = SyncLog("Labels")
+	try:
+		with log.recording():
+			file = _create_shipping_label(doc, values, label_job=label_job)
+	except frappe.ValidationError as e:
+		frappe.db.rollback()
+		log.count("failed")
+		log.fail(str(e))
+		log.save()
+		update_label_job(label_job, status="Failed", error=str(e))
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title="Error while creating Shipstation label")
+		log.count("failed")
+		log.fail(frappe.get_traceback())
+		log.save()
+		update_label_job(
+			label_job,
+			status="Failed",
+			error=_("There was an error generating the label. Please contact your administrator."),
+		)
+	else:
+		# the document has to be up to date before the form is told to reload
+		frappe.db.commit()
+		log.count("created", 1 if file else 0)
+		log.save()
+		update_label_job(
+			label_job,
+			status="Finished",
+			completed=1,
+			labels={file.attached_to_name: file.file_url} if file else {},
+		)
 
 
 def create_shipping_label_folder():
-	if not frappe.db.get_value("File", "Home/Shipstation Labels"):
+	if not frappe.db.get_value("File", LABEL_FOLDER):
 		folder: "File" = frappe.new_doc("File")
 		folder.update({"file_name": "Shipstation Labels", "is_folder": True, "folder": "Home"})
 		folder.save()
 
 
-def _create_shipping_label(doc: str, values: str, user: str = ""):
+def _create_shipping_label(doc: str, values: str, label_job: str | None = None) -> "File | None":
 	if isinstance(doc, str):
 		doc: frappe._dict = frappe._dict(json.loads(doc))
 		values: frappe._dict = frappe._dict(json.loads(values))
@@ -57,12 +125,46 @@ def _create_shipping_label(doc: str, values: str, user: str = ""):
 	if not settings_name:
 		frappe.throw(_("No Shipstation order reference found"))
 
+	log = telemetry.get_sync_log()
+	if log:
+		log.settings_name = settings_name
+
 	settings: "ShipstationSettings" = frappe.get_cached_doc("Shipstation Settings", settings_name)
 
 	if not settings.enabled:
 		return
 
-	values.package = "package" if values.package.lower() == "package" else values.package
+	with telemetry.phase("prepare"):
+		shipstation_order = prepare_label_order(doc, values)
+
+	client = settings.client()
+	client.timeout = 30
+
+	if label_job:
+		update_label_job(label_job, status="Generating Label")
+
+	try:
+		shipment = telemetry.timed_api(request_shipping_label)(
+			client, settings, doc, shipstation_order, values.gross_weight
+		)
+	except frappe.ValidationError as e:
+		process_error({}, message=str(e))
+
+	if label_job:
+		update_label_job(label_job, status="Saving Label")
+
+	with telemetry.phase("save"):
+		return save_shipping_label(doc, shipment)
+
+
+def prepare_label_order(doc: frappe._dict, values: frappe._dict) -> ShipStationOrder | None:
+	"""
+	Apply the label options to the document and, for documents that aren't linked to
+	a Shipstation order, build the order to generate the label for.
+	"""
+
+	if values.package:
+		values.package = "package" if values.package.lower() == "package" else values.package
 
 	doc.carrier_service = values.service
 	doc.package_code = values.package
@@ -70,50 +172,79 @@ def _create_shipping_label(doc: str, values: str, user: str = ""):
 	if not doc.ship_method_type:
 		doc.ship_method_type = values.ship_method_type
 
-	client = settings.client()
-	client.timeout = 30
+	# resolve the ship date here, since labels may be requested from worker threads
+	# that can't read the system timezone
+	doc.earliest_ship_date = get_datetime(today())
+	doc.default_ship_date = get_datetime(doc.delivery_date or today())
+
+	# linked orders are fetched from Shipstation along with the label request
+	if not doc.shipstation_order_id:
+		return make_shipstation_order(doc)
+
+
+def request_shipping_label(
+	client: "ShipStation",
+	settings: "ShipstationSettings",
+	doc: frappe._dict,
+	shipstation_order: ShipStationOrder | None,
+	gross_weight: float,
+) -> ShipStationOrder:
+	"""
+	Generate a label for the order in Shipstation.
+
+	Only talks to the Shipstation API, so it's safe to run in a thread; the ship
+	dates are resolved beforehand by `prepare_label_order`. Errors are raised as a
+	`frappe.ValidationError` with the message from Shipstation.
+	"""
 
 	# build the shipstation label payload
-	if doc.shipstation_order_id:
+	if not shipstation_order:
 		try:
 			shipstation_order = client.get_order(doc.shipstation_order_id)
 		except HTTPError as e:
-			response = e.response.json()
-			process_error(response)
-	else:
-		shipstation_order = make_shipstation_order(doc)
+			raise frappe.ValidationError(get_error_message(e))
 
 	update_carrier_code(doc, shipstation_order, settings)
 
-	if not shipstation_order.ship_date or shipstation_order.ship_date < get_datetime(today()):
-		shipstation_order.ship_date = get_datetime(doc.delivery_date or today())
+	if not shipstation_order.ship_date or shipstation_order.ship_date < doc.earliest_ship_date:
+		shipstation_order.ship_date = doc.default_ship_date
 
-	shipstation_order.weight = ShipStationWeight(value=values.gross_weight, units="pounds")
+	shipstation_order.weight = ShipStationWeight(value=gross_weight, units="pounds")
 
-	# generate and save the shipping label for the order
+	# generate the shipping label for the order
 	try:
 		shipment = client.create_label_for_order(shipstation_order)
 	except HTTPError as e:
-		response = e.response.json()
-		process_error(response)
+		raise frappe.ValidationError(get_error_message(e))
 
 	if isinstance(shipment, dict) and shipment.get("ExceptionMessage"):
-		process_error(
-			shipment,
-			message="There was an error generating the label. Please contact your administrator.",
+		raise frappe.ValidationError(
+			get_error_message(
+				shipment,
+				message="There was an error generating the label. Please contact your administrator.",
+			)
 		)
 
+	return shipment
+
+
+def save_shipping_label(doc: frappe._dict, shipment: ShipStationOrder) -> "File":
 	pdf = BytesIO(base64.b64decode(shipment.label_data))
 	file = attach_shipping_label(pdf, doc.doctype, doc.name)
 
 	if doc.doctype == "Delivery Note":
-		frappe.db.set_value(doc.doctype, doc.name, "shipstation_shipment_id", shipment.shipment_id)
-		frappe.db.set_value(doc.doctype, doc.name, "carrier", shipment.carrier_code.upper())
-		frappe.db.set_value(doc.doctype, doc.name, "carrier_service", shipment.service_code.upper())
-		frappe.db.set_value(doc.doctype, doc.name, "tracking_number", shipment.tracking_number)
+		frappe.db.set_value(
+			doc.doctype,
+			doc.name,
+			{
+				"shipstation_shipment_id": shipment.shipment_id,
+				"carrier": shipment.carrier_code.upper(),
+				"carrier_service": shipment.service_code.upper(),
+				"tracking_number": shipment.tracking_number,
+			},
+		)
 
-	if user:
-		push_attachment_update(file, user)
+	return file
 
 
 def attach_shipping_label(pdf: BytesIO, doctype: str, name: str):
@@ -128,19 +259,299 @@ def attach_shipping_label(pdf: BytesIO, doctype: str, name: str):
 		content=pdf.getvalue(),
 		dt=doctype,
 		dn=name,
-		folder="Home/Shipstation Labels",
+		folder=LABEL_FOLDER,
 		is_private=True,
 	)
 
 	return file
 
 
+@frappe.whitelist()
+def create_shipping_labels(delivery_notes: str, values: str):
+	"""
+	Generate shipping labels for a batch of submitted Delivery Notes in the background.
+	"""
+
+	delivery_notes: list[str] = frappe.parse_json(delivery_notes)
+	if not delivery_notes:
+		frappe.throw(_("Please select at least one Delivery Note"))
+
+	# the job loads the documents without permission checks, so check each one up front
+	for name in delivery_notes:
+		frappe.has_permission("Delivery Note", "write", doc=name, throw=True)
+
+	create_shipping_label_folder()
+	label_job = create_label_job(total=len(delivery_notes))
+	frappe.enqueue(
+		"shipstation_integration.shipping.run_bulk_label_job",
+		queue="long",
+		timeout=3600,
+		delivery_notes=delivery_notes,
+		values=frappe.parse_json(values) or {},
+		label_job=label_job,
+	)
+	return label_job
+
+
+def run_bulk_label_job(label_job: str, delivery_notes: list[str], values: dict):
+	log = SyncLog("Labels")
+	try:
+		with log.recording():
+			_create_shipping_labels(delivery_notes, values, label_job=label_job)
+	except Exception:
+		frappe.db.rollback()
+		frappe.log_error(title="Error while creating Shipstation labels")
+		log.fail(frappe.get_traceback())
+		log.save()
+		update_label_job(
+			label_job,
+			status="Failed",
+			error=_("There was an error generating the labels. Please contact your administrator."),
+		)
+	else:
+		log.save()
+
+
+def _create_shipping_labels(
+	delivery_notes: list[str], values: dict, label_job: str | None = None
+) -> "File | None":
+	"""
+	Generate the labels for each account concurrently, bounded by the account's
+	`max_concurrent_requests` and API rate limit. Each label is saved as a private
+	file as soon as it's generated, and all the labels are merged into a single PDF
+	for batch printing.
+	"""
+
+	values = frappe._dict(values)
+	labels: dict[str, "File"] = {}
+	errors: dict[str, str] = {}
+
+	requests: list[tuple["ShipstationSettings", frappe._dict, ShipStationOrder | None, float]] = []
+	weight_factors: dict[str, float] = {}
+	with telemetry.phase("prepare"):
+		for name in delivery_notes:
+			doc = frappe.get_doc("Delivery Note", name).as_dict()
+			settings_name = get_shipstation_settings(doc)
+
+			if doc.docstatus != 1:
+				errors[name] = _("Delivery Note must be submitted")
+				continue
+			elif not settings_name:
+				errors[name] = _("No Shipstation order reference found")
+				continue
+
+			settings: "ShipstationSettings" = frappe.get_cached_doc("Shipstation Settings", settings_name)
+			if not settings.enabled:
+				errors[name] = _("Shipstation Settings {0} is disabled").format(settings_name)
+				continue
+
+			try:
+				shipstation_order = prepare_label_order(doc, frappe._dict(values))
+				gross_weight = flt(values.gross_weight) or get_weight_in_pounds(doc, weight_factors)
+			except frappe.ValidationError as e:
+				errors[name] = str(e)
+				continue
+
+			requests.append((settings, doc, shipstation_order, gross_weight))
+
+	# batches spanning several accounts aren't attributed to any one of them
+	log = telemetry.get_sync_log()
+	settings_names = {settings.name for settings, *request in requests}
+	if log and len(settings_names) == 1:
+		log.settings_name = settings_names.pop()
+
+	if label_job:
+		update_label_job(label_job, status="Generating Labels", completed=len(errors), errors=errors)
+
+	executors: dict[str, ThreadPoolExecutor] = {}
+	clients: dict[str, "ShipStation"] = {}
+	futures: dict[Future, frappe._dict] = {}
+
+	try:
+		for settings, doc, shipstation_order, gross_weight in requests:
+			if settings.name not in executors:
+				executors[settings.name] = ThreadPoolExecutor(
+					max_workers=max(cint(settings.get("max_concurrent_requests")), 1),
+					thread_name_prefix="shipstation_labels",
+				)
+				clients[settings.name] = settings.client()
+				clients[settings.name].timeout = 30
+				# compile the carrier codes up front, so the lookups in the threads stay in-process
+				settings.get_carrier_index()
+
+			future = executors[settings.name].submit(
+				telemetry.timed_api(request_shipping_label),
+				clients[settings.name],
+				settings,
+				doc,
+				shipstation_order,
+				gross_weight,
+			)
+			futures[future] = doc
+
+		# files are saved on this thread, since database connections can't be shared
+		for future in as_completed(futures):
+			doc = futures[future]
+			try:
+				shipment = future.result()
+				with telemetry.phase("save"):
+					labels[doc.name] = save_shipping_label(doc, shipment)
+			except Exception as e:
+				frappe.db.rollback()
+				errors[doc.name] = str(e)
+				frappe.log_error(title=f"Error while creating Shipstation label for {doc.name}")
+			else:
+				# labels are paid for as soon as they're generated, so keep each one
+				frappe.db.commit()
+
+			if label_job:
+				update_label_job(label_job, completed=len(labels) + len(errors), errors=errors)
+	finally:
+		for executor in executors.values():
+			executor.shutdown(wait=True, cancel_futures=True)
+
+	merged_file = None
+	if labels:
+		if label_job:
+			update_label_job(label_job, status="Merging Labels")
+
+		with telemetry.phase("merge"):
+			merged_file = merge_shipping_labels([labels[name] for name in delivery_notes if name in labels])
+		frappe.db.commit()
+
+	telemetry.count("fetched", len(delivery_notes))
+	telemetry.count("created", len(labels))
+	telemetry.count("failed", len(errors))
+
+	if label_job:
+		update_label_job(
+			label_job,
+			status="Finished",
+			labels={name: file.file_url for name, file in labels.items()},
+			errors=errors,
+			merged_file=merged_file.file_url if merged_file else None,
+		)
+
+	return merged_file
+
+
+def get_weight_in_pounds(doc: frappe._dict, weight_factors: dict[str, float]) -> float:
+	"""
+	Get the total weight of the document's items in pounds, which is what labels are
+	requested in, converting from each item's weight UOM.
+
+	Args:
+		weight_factors: conversion factors to pounds already looked up, by weight UOM
+	"""
+
+	total_weight = 0.0
+	for item in doc.get("items") or []:
+		if not flt(item.total_weight):
+			continue
+
+		weight_uom = item.weight_uom or WEIGHT_UOM
+		if weight_uom not in weight_factors:
+			weight_factors[weight_uom] = (
+				1.0 if weight_uom == WEIGHT_UOM else flt(get_uom_conv_factor(weight_uom, WEIGHT_UOM))
+			)
+
+		if not weight_factors[weight_uom]:
+			raise frappe.ValidationError(
+				_("No conversion factor from {0} to {1} for the weight of item {2}").format(
+					weight_uom, WEIGHT_UOM, item.item_code
+				)
+			)
+
+		total_weight += flt(item.total_weight) * weight_factors[weight_uom]
+
+	return total_weight
+
+
+def get_label_job_key(label_job: str) -> str:
+	return f"shipstation_label_job|{label_job}"
+
+
+def create_label_job(total: int) -> str:
+	label_job = frappe.generate_hash(length=12)
+	frappe.cache().set_value(
+		get_label_job_key(label_job),
+		{
+			"label_job": label_job,
+			"user": frappe.session.user,
+			"status": "Queued",
+			"total": total,
+			"completed": 0,
+			"labels": {},
+			"errors": {},
+			"merged_file": None,
+		},
+		expires_in_sec=LABEL_JOB_EXPIRY,
+	)
+	return label_job
+
+
+def update_label_job(label_job: str, **status):
+	"""
+	Update the label job's progress, and push it to the user that queued the job.
+	"""
+
+	key = get_label_job_key(label_job)
+	job: dict = frappe.cache().get_value(key)
+	if not job:
+		return
+
+	job.update(status)
+	frappe.cache().set_value(key, job, expires_in_sec=LABEL_JOB_EXPIRY)
+	frappe.publish_realtime("shipstation_label_job", job, user=job["user"])
+
+
+@frappe.whitelist()
+def get_label_job(label_job: str) -> dict | None:
+	"""
+	Get the progress of a label job, for clients that can't follow the realtime updates.
+	"""
+
+	job: dict = frappe.cache().get_value(get_label_job_key(label_job))
+	if job and job["user"] == frappe.session.user:
+		return job
+
+
+def merge_shipping_labels(files: list["File"]) -> "File":
+	"""
+	Merge the label PDFs, in order, into a single private file for batch printing.
+	"""
+
+	writer = PdfWriter()
+	for file in files:
+		writer.append(BytesIO(file.get_content()))
+
+	pdf = BytesIO()
+	writer.write(pdf)
+
+	return save_file(
+		fname=f"shipstation_labels_{now_datetime().strftime('%Y%m%d_%H%M%S')}.pdf",
+		content=pdf.getvalue(),
+		dt=None,
+		dn=None,
+		folder=LABEL_FOLDER,
+		is_private=True,
+	)
+
+
+def get_error_message(error: HTTPError | dict, message: str = "") -> str:
+	if isinstance(error, HTTPError):
+		try:
+			error = error.response.json()
+		except Exception:
+			error = {}
+
+	if isinstance(error, dict) and error.get("ExceptionMessage"):
+		return error.get("ExceptionMessage")
+	return message or "There was an error processing the request. Please contact your administrator."
+
+
 def process_error(response: dict, message: str = "") -> NoReturn:
-	if not message:
-		message = "There was an error processing the request. Please contact your administrator."
-	if isinstance(response, dict) and response.get("ExceptionMessage"):
-		message = response.get("ExceptionMessage")
-	frappe.throw(_(message))
+	frappe.throw(_(get_error_message(response, message)))
 
 
 def update_carrier_code(
@@ -194,10 +605,20 @@ def make_shipstation_order(doc: frappe._dict):
 
 
 @frappe.whitelist()
-def get_carrier_services(settings: str):
+def get_carrier_services(settings: str, carrier: str | None = None) -> list[dict] | None:
+	"""
+	Get the carriers for an account, with only the names of their services and packages.
+	Optionally filter by a carrier's name or nickname.
+	"""
+
 	if settings:
-		shipstation_settings: "ShipstationSettings" = frappe.get_doc("Shipstation Settings", settings)
-		return shipstation_settings._carrier_data()
+		carrier_data = frappe.db.get_value("Shipstation Settings", settings, "carrier_data")
+		options = get_carrier_index(carrier_data)["options"]
+
+		if carrier:
+			options = [option for option in options if carrier in (option["name"], option["nickname"])]
+
+		return options
 
 
 @frappe.whitelist()
@@ -217,9 +638,20 @@ def get_shipstation_settings(doc: str) -> str | None:
 
 
 @frappe.whitelist()
-def push_attachment_update(attachment: "File", user: str):
-	js = f"if (cur_frm.doc.name =='{attachment.attached_to_name}') {{cur_frm.refresh();}}"
-	frappe.publish_realtime("eval_js", js, user=user or frappe.session.user)
+def get_bulk_label_settings(delivery_notes: str) -> str | None:
+	"""
+	Get the Shipstation account for a batch of Delivery Notes, if they all belong to the same one.
+	"""
+
+	delivery_notes = frappe.get_all(
+		"Delivery Note",
+		filters={"name": ("in", frappe.parse_json(delivery_notes))},
+		fields=["integration_doctype", "integration_doc", "shipstation_store_name"],
+	)
+
+	settings = {get_shipstation_settings(doc) for doc in delivery_notes}
+	if len(settings) == 1:
+		return settings.pop()
 
 
 @frappe.whitelist()
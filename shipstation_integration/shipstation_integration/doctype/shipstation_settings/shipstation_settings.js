@@ -78,7 +78,7 @@ frappe.ui.form.on("Shipstation Settings", {
 
 	refresh: (frm) => {
 		frm.trigger("toggle_mandatory_table_fields");
-		if (frm.doc.carrier_data) {
+		if (frm.doc.__onload && frm.doc.__onload.carriers) {
 			const wrapper = $(frm.fields_dict.carriers_html.wrapper);
 			wrapper.html(
 				frappe.render_template("carriers", {
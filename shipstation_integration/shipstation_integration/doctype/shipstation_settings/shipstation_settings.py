@@ -2,19 +2,28 @@
 # For license information, please see license.txt
 
 import json
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode
 
 import frappe
 from frappe import _
 from frappe.model.document import Document
+from frappe.utils import cint, get_url
 from frappe.utils.nestedset import get_root_of
 from httpx import HTTPError
-from shipstation import ShipStation
 
+from shipstation_integration.carriers import get_carrier_data_hash, get_carrier_index
+from shipstation_integration.client import close_session, get_client
+from shipstation_integration.extensions import HookRegistry
 from shipstation_integration.items import create_item
 from shipstation_integration.orders import list_orders
 from shipstation_integration.shipments import list_shipments
 from shipstation_integration.utils import get_marketplace
 
+# services and packages rarely change, so repeated refreshes can reuse them for a while
+CARRIER_OPTIONS_EXPIRY = 60 * 60
+ACTIVE_WAREHOUSES_KEY = "shipstation_active_warehouse_ids"
+
 
 class ShipstationSettings(Document):
 	@property
@@ -24,24 +33,48 @@ class ShipstationSettings(Document):
 		return [s.get("storeId") for s in stores]
 
 	@property
-	def active_warehouse_ids(self) -> list[str]:
-		warehouse_ids = []
-
-		for warehouse in self.shipstation_warehouses:
-			warehouse_id = frappe.db.get_value(
-				"Warehouse", warehouse.get("warehouse"), "shipstation_warehouse_id"
+	def active_warehouse_ids(self) -> set[str | None]:
+		"""
+		The Shipstation IDs of the account's warehouses. Cached per account, and also held
+		locally for the rest of the request or job by the cache's `hget`.
+
+		Warehouses without a Shipstation ID are kept as `None`, so they don't match any
+		orders that come from a Shipstation warehouse.
+		"""
+
+		warehouse_ids = frappe.cache().hget(ACTIVE_WAREHOUSES_KEY, self.name)
+		if warehouse_ids is None:
+			warehouses = [row.warehouse for row in self.shipstation_warehouses]
+			shipstation_ids = dict(
+				frappe.get_all(
+					"Warehouse",
+					filters={"name": ("in", [warehouse for warehouse in warehouses if warehouse])},
+					fields=["name", "shipstation_warehouse_id"],
+					as_list=True,
+				)
+				if any(warehouses)
+				else []
 			)
-			warehouse_ids.append(warehouse_id)
+			warehouse_ids = {shipstation_ids.get(warehouse) or None for warehouse in warehouses}
+			frappe.cache().hset(ACTIVE_WAREHOUSES_KEY, self.name, warehouse_ids)
 
 		return warehouse_ids
 
 	def onload(self):
 		if self.carrier_data:
-			self.set_onload("carriers", self._carrier_data())
+			self.set_onload("carriers", self.get_carrier_index()["options"])
+
+		# the desk only needs the compiled options, so the raw carrier data isn't sent with the form
+		self.carrier_data = None
 
 	def validate(self):
+		# forms saved from the desk don't have the carrier data, so keep the saved copy
+		if not self.carrier_data and not self.is_new():
+			self.carrier_data = self.get_db_value("carrier_data")
+
 		self.validate_label_generation()
 		self.validate_enabled_stores()
+		self.set_webhook_url()
 		if self.hours_to_fetch < 24:
 			frappe.throw(
 				_("Order Age must be greater than or equal to 24 hours"),
@@ -64,11 +97,19 @@ class ShipstationSettings(Document):
 	def get_shipments(self):
 		list_shipments(self)
 
+	def on_update(self):
+		clear_active_warehouse_ids(self)
+
+	def on_trash(self):
+		clear_active_warehouse_ids(self)
+		close_session(self.name)
+
 	def client(self):
-		return ShipStation(
+		# a changed API key or secret automatically gets a new connection pool
+		return get_client(
+			None if self.is_new() else self.name,
 			key=self.get_password("api_key"),
 			secret=self.get_password("api_secret"),
-			debug=False,
 			timeout=30,
 		)
 
@@ -76,6 +117,18 @@ class ShipstationSettings(Document):
 		if not self.enabled and self.enable_label_generation:
 			self.enable_label_generation = False
 
+	def set_webhook_url(self):
+		if not self.enable_webhooks:
+			return
+
+		if not self.webhook_token:
+			self.webhook_token = frappe.generate_hash(length=32)
+
+		query = urlencode({"settings": self.name, "token": self.webhook_token})
+		self.webhook_url = get_url(
+			f"/api/method/shipstation_integration.webhooks.handle_webhook?{query}"
+		)
+
 	def validate_enabled_stores(self):
 		for store in self.shipstation_stores:
 			if store.enable_shipments and not store.enable_orders:
@@ -95,24 +148,85 @@ class ShipstationSettings(Document):
 				frappe.throw(_(e.text))
 
 	@frappe.whitelist()
-	def update_carriers_and_stores(self):
-		client = self.client()
+	def update_carriers_and_stores(self, force: bool = True):
+		"""
+		Refresh the carriers and stores from Shipstation, and only save the settings if
+		either of them changed. Unless forced, recently fetched carrier options are reused.
+		"""
 
-		unstructured_carriers = []
-		carriers = client.list_carriers()
-		for carrier in carriers:
-			carrier_dict = carrier._unstructure()
-			services = client.list_services(carrier.code)
-			carrier_dict["services"] = [s._unstructure() for s in services]
-			packages = client.list_packages(carrier.code)
-			carrier_dict["packages"] = [p._unstructure() for p in packages]
-			unstructured_carriers.append(carrier_dict)
-
-		self.carrier_data = json.dumps(unstructured_carriers)
+		carrier_data = self.fetch_carrier_data(force=cint(force))
+
+		# forms loaded in the desk don't have the carrier data, so compare with the saved copy
+		saved_carrier_data = self.carrier_data
+		if not saved_carrier_data and not self.is_new():
+			saved_carrier_data = self.get_db_value("carrier_data")
+
+		carriers_changed = get_carrier_data_hash(carrier_data) != get_carrier_data_hash(
+			saved_carrier_data
+		)
+		if carriers_changed:
+			self.carrier_data = carrier_data
+
+		stores = self.get_store_snapshot()
 		self.update_stores()
-		self.save()
+
+		if carriers_changed or stores != self.get_store_snapshot():
+			self.save()
 		return self
 
+	def fetch_carrier_data(self, force: bool = False) -> str:
+		"""
+		Fetch the account's carriers, along with each carrier's services and packages.
+		The per-carrier requests are made concurrently, and their results are cached
+		for `CARRIER_OPTIONS_EXPIRY` seconds.
+		"""
+
+		client = self.client()
+		carriers = [carrier._unstructure() for carrier in client.list_carriers()]
+
+		# the cache is only accessed from this thread, since the workers have no site context
+		carrier_options: dict[str, dict] = {}
+		if not force:
+			for carrier in carriers:
+				cached_options = frappe.cache().get_value(self.get_carrier_options_key(carrier["code"]))
+				if cached_options:
+					carrier_options[carrier["code"]] = cached_options
+
+		missing_codes = [
+			carrier["code"] for carrier in carriers if carrier["code"] not in carrier_options
+		]
+		if missing_codes:
+			with ThreadPoolExecutor(
+				max_workers=max(cint(self.get("max_concurrent_requests")), 1),
+				thread_name_prefix="shipstation_carriers",
+			) as executor:
+				services = executor.map(client.list_services, missing_codes)
+				packages = executor.map(client.list_packages, missing_codes)
+
+				for code, carrier_services, carrier_packages in zip(missing_codes, services, packages):
+					carrier_options[code] = {
+						"services": [service._unstructure() for service in carrier_services],
+						"packages": [package._unstructure() for package in carrier_packages],
+					}
+					frappe.cache().set_value(
+						self.get_carrier_options_key(code),
+						carrier_options[code],
+						expires_in_sec=CARRIER_OPTIONS_EXPIRY,
+					)
+
+		for carrier in carriers:
+			carrier.update(carrier_options[carrier["code"]])
+
+		return json.dumps(carriers)
+
+	def get_carrier_options_key(self, carrier_code: str) -> str:
+		return f"shipstation_carrier_options|{self.name}|{carrier_code}"
+
+	def get_store_snapshot(self) -> list[tuple]:
+		return [
+			(store.store_id, store.marketplace_name, store.store_name) for store in self.shipstation_stores
+		]
+
 	@frappe.whitelist()
 	def update_warehouses(self):
 		self.shipstation_warehouses = []
@@ -212,34 +326,33 @@ class ShipstationSettings(Document):
 		if not products.results:
 			return "No products found to import"
 
+		hooks = HookRegistry()
 		for product in products:
-			create_item(product, settings=self)
+			create_item(product, settings=self, hooks=hooks)
 
 		return f"{len(products.results)} product(s) imported succesfully"
 
 	def _carrier_data(self):
 		return json.loads(self.carrier_data)
 
+	def get_carrier_index(self) -> dict:
+		return get_carrier_index(self.carrier_data)
+
 	def get_carrier_services(self, carrier):
-		for ss_carrier in self._carrier_data():
-			if carrier in [ss_carrier["name"], ss_carrier["nickname"]]:
-				return "\n".join([s["name"] for s in ss_carrier["services"]])
+		ss_carrier = self.get_carrier_index()["carriers"].get(carrier)
+		if ss_carrier:
+			return "\n".join(ss_carrier["services"])
 
 	def get_codes(self, carrier, service, package):
-		_carrier, _service, _package = None, None, "Package"
-		for ss_carrier in self._carrier_data():
-			if carrier in [ss_carrier.get("name"), ss_carrier.get("nickname")]:
-				_carrier = ss_carrier["code"]
-
-				for serv in ss_carrier["services"]:
-					if serv["name"] == service:
-						_service = serv["code"]
-
-				for pack in ss_carrier["packages"]:
-					if pack["name"] == package:
-						_package = pack["code"]
-
-		return _carrier, _service, _package
+		ss_carrier = self.get_carrier_index()["carriers"].get(carrier)
+		if not ss_carrier:
+			return None, None, "Package"
+
+		return (
+			ss_carrier["code"],
+			ss_carrier["services"].get(service),
+			ss_carrier["packages"].get(package, "Package"),
+		)
 
 	# create custom fields on the Sales Order Item doctype from the item_custom_fields table (for storing Shipstation metadata)
 	@frappe.whitelist()
@@ -292,3 +405,15 @@ class ShipstationSettings(Document):
 				for dt in item_doctypes:
 					if frappe.db.exists("Custom Field", {"dt": dt, "fieldname": fieldname}):
 						frappe.db.delete("Custom Field", {"dt": dt, "fieldname": fieldname})
+
+
+def clear_active_warehouse_ids(doc: Document, method: str | None = None, *args, **kwargs):
+	"""
+	Clear the cached warehouse IDs for an account when its settings change, or for all
+	accounts when a Warehouse changes.
+	"""
+
+	if doc.doctype == "Shipstation Settings":
+		frappe.cache().hdel(ACTIVE_WAREHOUSES_KEY, doc.name)
+	else:
+		frappe.cache().delete_value(ACTIVE_WAREHOUSES_KEY)
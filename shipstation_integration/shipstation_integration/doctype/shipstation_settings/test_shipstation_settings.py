@@ -1,8 +1,67 @@
 # Copyright (c) 2020, Parsimony LLC and Contributors
 # See license.txt
 
-import unittest
+import json
 
+import frappe
+from frappe.tests.utils import FrappeTestCase
 
-class TestShipstationSettings(unittest.TestCase):
-	pass
+from shipstation_integration.client import set_transport
+from shipstation_integration.tests.fake_shipstation import STORE_ID, FakeShipStation
+from shipstation_integration.tests.utils import create_shipstation_settings
+
+
+class TestShipstationSettings(FrappeTestCase):
+	def setUp(self):
+		self.shipstation = FakeShipStation()
+		set_transport(self.shipstation.transport)
+		self.settings = create_shipstation_settings()
+
+	def tearDown(self):
+		set_transport(None)
+
+	def test_carriers_and_stores_are_fetched(self):
+		carriers = json.loads(self.settings.carrier_data)
+		self.assertEqual(carriers[0]["code"], "fake_carrier")
+		self.assertEqual([service["name"] for service in carriers[0]["services"]], ["Ground", "Express"])
+		self.assertIn(str(STORE_ID), [str(store.store_id) for store in self.settings.shipstation_stores])
+
+		self.assertEqual(
+			self.settings.get_codes("Fake Carrier", "Express", "Flat Rate Box"),
+			("fake_carrier", "fake_express", "fake_flat_rate_box"),
+		)
+
+	def test_unchanged_carriers_are_not_saved(self):
+		modified = frappe.db.get_value("Shipstation Settings", self.settings.name, "modified")
+
+		self.settings.update_carriers_and_stores(force=False)
+
+		self.assertEqual(
+			frappe.db.get_value("Shipstation Settings", self.settings.name, "modified"), modified
+		)
+
+	def test_unchanged_carriers_are_not_saved_from_the_desk(self):
+		modified = frappe.db.get_value("Shipstation Settings", self.settings.name, "modified")
+
+		# forms loaded in the desk don't have the carrier data
+		settings = frappe.get_doc("Shipstation Settings", self.settings.name)
+		settings.run_method("onload")
+		settings.update_carriers_and_stores(force=False)
+
+		self.assertEqual(
+			frappe.db.get_value("Shipstation Settings", self.settings.name, "modified"), modified
+		)
+
+	def test_carrier_data_is_not_sent_to_the_desk(self):
+		settings = frappe.get_doc("Shipstation Settings", self.settings.name)
+		settings.run_method("onload")
+
+		self.assertIsNone(settings.carrier_data)
+		self.assertEqual(settings.get_onload().carriers[0]["name"], "Fake Carrier")
+
+		# saving the form without the carrier data keeps the saved copy
+		settings.save()
+		self.assertEqual(
+			frappe.db.get_value("Shipstation Settings", settings.name, "carrier_data"),
+			self.settings.carrier_data,
+		)
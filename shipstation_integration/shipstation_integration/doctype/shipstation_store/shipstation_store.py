@@ -1,9 +1,59 @@
 # Copyright (c) 2020, Parsimony LLC and contributors
 # For license information, please see license.txt
 
+import datetime
+from zoneinfo import ZoneInfo
 
+import frappe
 from frappe.model.document import Document
+from frappe.utils import get_datetime
+
+# re-fetch a little before the stored cursor, so records that were modified
+# while the previous sync was running aren't missed
+SYNC_OVERLAP = datetime.timedelta(minutes=15)
+# Shipstation filters and reports dates in Pacific time, so the cursors are kept in it too
+SHIPSTATION_TIMEZONE = ZoneInfo("America/Los_Angeles")
+
+
+def get_shipstation_now() -> datetime.datetime:
+	"""
+	Get the current time in Shipstation's timezone, as a naive datetime like the
+	dates Shipstation filters on.
+	"""
+
+	return datetime.datetime.now(SHIPSTATION_TIMEZONE).replace(tzinfo=None)
 
 
 class ShipstationStore(Document):
-	pass
+	def get_sync_start(self, cursor: str, default: datetime.datetime) -> datetime.datetime:
+		"""
+		Get the date to start fetching from, based on the given cursor field
+		("last_order_sync" or "last_shipment_sync"). Falls back to the default
+		if the store hasn't been synced yet.
+		"""
+
+		last_sync = self.get(cursor)
+		if not last_sync:
+			return default
+		return get_datetime(last_sync) - SYNC_OVERLAP
+
+	def advance_sync_cursor(
+		self, cursor: str, window_start: datetime.datetime, window_end: datetime.datetime
+	):
+		"""
+		Move the store's cursor forward to the end of a fetched window. Should
+		only be called after the records in that window have been committed.
+		"""
+
+		last_sync = self.get(cursor)
+		if last_sync:
+			last_sync = get_datetime(last_sync)
+
+			# leave the cursor as-is if the window doesn't connect with it,
+			# otherwise the records in between would never be fetched
+			if window_start > last_sync or window_end <= last_sync:
+				return
+
+		self.set(cursor, window_end)
+		frappe.db.set_value("Shipstation Store", self.name, cursor, window_end, update_modified=False)
+		frappe.db.commit()
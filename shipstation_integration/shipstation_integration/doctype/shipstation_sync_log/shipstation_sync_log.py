@@ -0,0 +1,26 @@
+# Copyright (c) 2026, Parsimony LLC and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import Interval
+from frappe.query_builder.functions import Now
+from frappe.utils import add_days, now_datetime
+
+
+class ShipstationSyncLog(Document):
+	@staticmethod
+	def clear_old_logs(days: int = 30):
+		# profiles are attached to their run's log, and are removed along with it
+		for file in frappe.get_all(
+			"File",
+			filters={
+				"attached_to_doctype": "Shipstation Sync Log",
+				"creation": ["<", add_days(now_datetime(), -days)],
+			},
+			pluck="name",
+		):
+			frappe.delete_doc("File", file, ignore_permissions=True)
+
+		table = frappe.qb.DocType("Shipstation Sync Log")
+		frappe.db.delete(table, filters=(table.creation < (Now() - Interval(days=days))))
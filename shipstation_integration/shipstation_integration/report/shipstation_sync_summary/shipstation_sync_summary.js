@@ -0,0 +1,33 @@
+// Copyright (c) 2026, Parsimony LLC and contributors
+// For license information, please see license.txt
+
+frappe.query_reports["Shipstation Sync Summary"] = {
+	filters: [
+		{
+			fieldname: "from_date",
+			label: __("From Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.add_days(frappe.datetime.get_today(), -7),
+			reqd: 1,
+		},
+		{
+			fieldname: "to_date",
+			label: __("To Date"),
+			fieldtype: "Date",
+			default: frappe.datetime.get_today(),
+			reqd: 1,
+		},
+		{
+			fieldname: "sync_type",
+			label: __("Sync Type"),
+			fieldtype: "Select",
+			options: ["", "Orders", "Shipments", "Labels"],
+		},
+		{
+			fieldname: "shipstation_settings",
+			label: __("Shipstation Settings"),
+			fieldtype: "Link",
+			options: "Shipstation Settings",
+		},
+	],
+};
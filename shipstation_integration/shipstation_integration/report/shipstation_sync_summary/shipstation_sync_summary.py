@@ -0,0 +1,93 @@
+# Copyright (c) 2026, Parsimony LLC and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe import _
+from frappe.query_builder import Case
+from frappe.query_builder.functions import Avg, Count, Max, Sum
+from frappe.utils import add_days, getdate
+
+
+def execute(filters: dict | None = None):
+	filters = frappe._dict(filters or {})
+	return get_columns(), get_data(filters)
+
+
+def get_columns():
+	return [
+		{
+			"fieldname": "shipstation_settings",
+			"label": _("Shipstation Settings"),
+			"fieldtype": "Link",
+			"options": "Shipstation Settings",
+			"width": 160,
+		},
+		{"fieldname": "store_name", "label": _("Store"), "fieldtype": "Data", "width": 160},
+		{"fieldname": "sync_type", "label": _("Sync Type"), "fieldtype": "Data", "width": 100},
+		{"fieldname": "runs", "label": _("Runs"), "fieldtype": "Int", "width": 80},
+		{"fieldname": "failed_runs", "label": _("Failed Runs"), "fieldtype": "Int", "width": 100},
+		{"fieldname": "fetched", "label": _("Fetched"), "fieldtype": "Int", "width": 90},
+		{"fieldname": "created", "label": _("Created"), "fieldtype": "Int", "width": 90},
+		{"fieldname": "updated", "label": _("Updated"), "fieldtype": "Int", "width": 90},
+		{"fieldname": "skipped", "label": _("Skipped"), "fieldtype": "Int", "width": 90},
+		{"fieldname": "failed", "label": _("Failed"), "fieldtype": "Int", "width": 90},
+		{
+			"fieldname": "avg_duration",
+			"label": _("Avg Duration (s)"),
+			"fieldtype": "Float",
+			"precision": 2,
+			"width": 130,
+		},
+		{
+			"fieldname": "avg_api_time",
+			"label": _("Avg API Time (s)"),
+			"fieldtype": "Float",
+			"precision": 2,
+			"width": 130,
+		},
+		{
+			"fieldname": "avg_db_time",
+			"label": _("Avg DB Time (s)"),
+			"fieldtype": "Float",
+			"precision": 2,
+			"width": 130,
+		},
+		{"fieldname": "last_run", "label": _("Last Run"), "fieldtype": "Datetime", "width": 160},
+	]
+
+
+def get_data(filters: frappe._dict) -> list[dict]:
+	SyncLog = frappe.qb.DocType("Shipstation Sync Log")
+
+	query = (
+		frappe.qb.from_(SyncLog)
+		.select(
+			SyncLog.shipstation_settings,
+			SyncLog.store_name,
+			SyncLog.sync_type,
+			Count("*").as_("runs"),
+			Sum(Case().when(SyncLog.status == "Failed", 1).else_(0)).as_("failed_runs"),
+			Sum(SyncLog.fetched).as_("fetched"),
+			Sum(SyncLog.created).as_("created"),
+			Sum(SyncLog.updated).as_("updated"),
+			Sum(SyncLog.skipped).as_("skipped"),
+			Sum(SyncLog.failed).as_("failed"),
+			Avg(SyncLog.duration).as_("avg_duration"),
+			Avg(SyncLog.api_time).as_("avg_api_time"),
+			Avg(SyncLog.db_time).as_("avg_db_time"),
+			Max(SyncLog.started_at).as_("last_run"),
+		)
+		.where(SyncLog.started_at >= getdate(filters.from_date))
+		.where(SyncLog.started_at < add_days(getdate(filters.to_date), 1))
+		.groupby(SyncLog.shipstation_settings, SyncLog.store_name, SyncLog.sync_type)
+		.orderby(SyncLog.shipstation_settings)
+		.orderby(SyncLog.store_name)
+		.orderby(SyncLog.sync_type)
+	)
+
+	if filters.sync_type:
+		query = query.where(SyncLog.sync_type == filters.sync_type)
+	if filters.shipstation_settings:
+		query = query.where(SyncLog.shipstation_settings == filters.shipstation_settings)
+
+	return query.run(as_dict=True)
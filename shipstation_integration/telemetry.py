@@ -0,0 +1,333 @@
+import cProfile
+import datetime
+import json
+import marshal
+import os
+import sys
+import time
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from functools import wraps
+from threading import Event, Lock, Thread
+from threading import enumerate as enumerate_threads
+from threading import get_ident
+from typing import TYPE_CHECKING, Optional
+
+import frappe
+from frappe.utils import flt, get_datetime, now_datetime
+from frappe.utils.file_manager import save_file
+
+from shipstation_integration.client import get_throttling
+
+if TYPE_CHECKING:
+	from shipstation_integration.shipstation_integration.doctype.shipstation_store.shipstation_store import (
+		ShipstationStore,
+	)
+
+PROFILER_SAMPLE_INTERVAL = 0.005
+
+
+class SyncLog:
+	"""
+	Collects the timings, counts and watermarks for one store's part of a sync run (or a
+	label request), and saves them as a `Shipstation Sync Log`.
+	"""
+
+	def __init__(
+		self,
+		sync_type: str,
+		settings_name: str | None = None,
+		store: Optional["ShipstationStore"] = None,
+	):
+		self.sync_type = sync_type
+		self.settings_name = settings_name
+		self.store = store
+		self.name: str | None = None
+		self.window_start: datetime.datetime | None = None
+		self.window_end: datetime.datetime | None = None
+		self.error: str | None = None
+
+		self.started_at = now_datetime()
+		self.start = time.perf_counter()
+		self.api_time = 0.0
+		self.api_calls = 0
+		self.throttled_requests = 0
+		self.throttled_time = 0.0
+		self.db_time = 0.0
+		self.queries = 0
+		self.phases: defaultdict[str, float] = defaultdict(float)
+		self.counts: Counter[str] = Counter()
+
+		# API calls are timed from the fetch threads
+		self.lock = Lock()
+
+	def set_window(self, start: datetime.datetime | str | None, end: datetime.datetime | str | None):
+		self.window_start = get_datetime(start) if start else None
+		self.window_end = get_datetime(end) if end else None
+
+	def count(self, name: str, value: int = 1):
+		self.counts[name] += value
+
+	def add_phase_time(self, name: str, elapsed: float):
+		with self.lock:
+			self.phases[name] += elapsed
+
+	def timed_api(self, method: Callable) -> Callable:
+		"""
+		Wrap a Shipstation client method to add its calls to the log's API time, along
+		with any time they were held back by the rate limiter. Safe to call from the
+		fetch threads.
+		"""
+
+		@wraps(method)
+		def timed(*args, **kwargs):
+			start = time.perf_counter()
+			throttled_requests, throttled_time = get_throttling()
+			try:
+				return method(*args, **kwargs)
+			finally:
+				elapsed = time.perf_counter() - start
+				requests, seconds = get_throttling()
+				with self.lock:
+					self.api_time += elapsed
+					self.api_calls += 1
+					self.throttled_requests += requests - throttled_requests
+					self.throttled_time += seconds - throttled_time
+
+		return timed
+
+	@contextmanager
+	def recording(self) -> Iterator["SyncLog"]:
+		"""
+		Make this the active log for the current thread, so phases, counts and database
+		queries in the sync pipeline are recorded against it.
+		"""
+
+		previous_log = getattr(frappe.local, "shipstation_sync_log", None)
+		frappe.local.shipstation_sync_log = self
+		restore_sql = patch_sql()
+		try:
+			yield self
+		finally:
+			frappe.local.shipstation_sync_log = previous_log
+			if restore_sql:
+				restore_sql()
+
+	def fail(self, error: str):
+		self.error = error
+
+	def save(self):
+		"""
+		Insert the sync log in its own transaction, so it's kept even if the run's
+		pending changes are rolled back.
+		"""
+
+		if self.error:
+			status = "Partial Failure" if self.counts["created"] or self.counts["updated"] else "Failed"
+		elif self.counts["failed"]:
+			status = "Partial Failure"
+		else:
+			status = "Success"
+
+		log = frappe.get_doc(
+			{
+				"doctype": "Shipstation Sync Log",
+				"sync_type": self.sync_type,
+				"status": status,
+				"shipstation_settings": self.settings_name,
+				"store_name": self.store.store_name if self.store else None,
+				"store_id": self.store.store_id if self.store else None,
+				"started_at": self.started_at,
+				"finished_at": now_datetime(),
+				"duration": flt(time.perf_counter() - self.start, 3),
+				"window_start": self.window_start,
+				"window_end": self.window_end,
+				"fetched": self.counts["fetched"],
+				"created": self.counts["created"],
+				"updated": self.counts["updated"],
+				"skipped": self.counts["skipped"],
+				"failed": self.counts["failed"],
+				"api_calls": self.api_calls,
+				"throttled_requests": self.throttled_requests,
+				"queries": self.queries,
+				"api_time": flt(self.api_time, 3),
+				"throttled_time": flt(self.throttled_time, 3),
+				"db_time": flt(self.db_time, 3),
+				"phase_timings": json.dumps(
+					{phase: flt(elapsed, 3) for phase, elapsed in sorted(self.phases.items())}
+				),
+				"error": self.error,
+			}
+		)
+		log.insert(ignore_permissions=True)
+		self.name = log.name
+		frappe.db.commit()
+		return log
+
+
+class Profiler:
+	"""
+	Profiles a sync run, with both a deterministic profile (`cProfile`) of the thread
+	that started it, which processes the documents, and a sampled profile of every
+	thread, which also covers the fetch threads.
+
+	Only created for accounts with profiling enabled, so runs without it have no
+	overhead at all.
+	"""
+
+	def __init__(self, interval: float = PROFILER_SAMPLE_INTERVAL):
+		self.interval = interval
+		self.profile: cProfile.Profile | None = None
+		self.samples: Counter[str] = Counter()
+		self.stopped = Event()
+		self.sampler: Thread | None = None
+
+	def start(self) -> "Profiler":
+		self.profile = cProfile.Profile()
+		try:
+			self.profile.enable()
+		except ValueError:
+			# another profiler is already active (e.g. `bench --profile`), so only sample
+			self.profile = None
+
+		self.sampler = Thread(target=self.sample, name="shipstation_profiler", daemon=True)
+		self.sampler.start()
+		return self
+
+	def stop(self):
+		if self.stopped.is_set():
+			return
+
+		self.stopped.set()
+		if self.profile:
+			self.profile.disable()
+		if self.sampler:
+			self.sampler.join()
+
+	def sample(self):
+		own_id = get_ident()
+		while not self.stopped.wait(self.interval):
+			thread_names = {thread.ident: thread.name for thread in enumerate_threads()}
+			for thread_id, frame in sys._current_frames().items():
+				if thread_id == own_id:
+					continue
+
+				stack = []
+				while frame:
+					code = frame.f_code
+					filename = os.sep.join(code.co_filename.split(os.sep)[-2:])
+					stack.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+					frame = frame.f_back
+
+				stack.append(thread_names.get(thread_id, str(thread_id)))
+				self.samples[";".join(reversed(stack))] += 1
+
+	def get_stats(self) -> bytes | None:
+		"""
+		The deterministic profile, in the format written by `pstats.Stats.dump_stats`.
+		"""
+
+		if not self.profile:
+			return None
+
+		self.profile.create_stats()
+		return marshal.dumps(self.profile.stats)
+
+	def get_collapsed_stacks(self) -> str:
+		"""
+		The sampled stacks, one `frame;frame;frame count` line per stack, as read by
+		`flamegraph.pl`, speedscope and other flame graph tools.
+		"""
+
+		return "\n".join(f"{stack} {count}" for stack, count in sorted(self.samples.items()))
+
+	def save(self, log: SyncLog | None):
+		"""
+		Stop the profiler, and attach the profile to a saved log for the run.
+		"""
+
+		self.stop()
+		if log and log.name:
+			self.attach("Shipstation Sync Log", log.name)
+			frappe.db.commit()
+
+	def attach(self, doctype: str, name: str):
+		"""
+		Save the profile as private files attached to the document.
+		"""
+
+		stats = self.get_stats()
+		if stats:
+			save_file(f"{name}.prof", stats, doctype, name, is_private=True)
+
+		save_file(f"{name}.collapsed.txt", self.get_collapsed_stacks(), doctype, name, is_private=True)
+
+
+def get_sync_log() -> SyncLog | None:
+	return getattr(frappe.local, "shipstation_sync_log", None)
+
+
+@contextmanager
+def phase(name: str):
+	"""
+	Time a phase of the sync pipeline against the active log, if there is one.
+	"""
+
+	log = get_sync_log()
+	if not log:
+		yield
+		return
+
+	start = time.perf_counter()
+	try:
+		yield
+	finally:
+		log.add_phase_time(name, time.perf_counter() - start)
+
+
+def count(name: str, value: int = 1):
+	log = get_sync_log()
+	if log:
+		log.count(name, value)
+
+
+def timed_api(method: Callable) -> Callable:
+	"""
+	Wrap a Shipstation API call to be timed against the active log, if there is one.
+	"""
+
+	log = get_sync_log()
+	return log.timed_api(method) if log else method
+
+
+def patch_sql() -> Callable | None:
+	"""
+	Time the database queries made while a sync log is recording, in the same way
+	`frappe.recorder` wraps `frappe.db.sql`. Returns a function to restore the
+	original method, or `None` if the queries are already being timed.
+	"""
+
+	if getattr(frappe.db, "_shipstation_sql", None):
+		return None
+
+	sql = frappe.db.sql
+
+	def timed_sql(*args, **kwargs):
+		start = time.perf_counter()
+		try:
+			return sql(*args, **kwargs)
+		finally:
+			log = get_sync_log()
+			if log:
+				log.db_time += time.perf_counter() - start
+				log.queries += 1
+
+	frappe.db._shipstation_sql = sql
+	frappe.db.sql = timed_sql
+
+	def restore():
+		frappe.db.sql = sql
+		frappe.db._shipstation_sql = None
+
+	return restore
@@ -0,0 +1,218 @@
+"""
+Offline throughput benchmarks for the Shipstation sync.
+
+Each run serves synthetic orders, shipments, carriers and labels from an in-process
+`FakeShipStation`, and runs `list_orders`, `list_shipments` and label generation end
+to end against the site's database. Run it on a test site with ERPNext's test
+records installed:
+
+```
+bench --site test_site execute shipstation_integration.tests.benchmark.run
+bench --site test_site execute shipstation_integration.tests.benchmark.run --kwargs "{'volumes': [1000], 'labels': 100}"
+bench --site test_site execute shipstation_integration.tests.benchmark.run_billing_address_benchmark
+```
+
+Every run adds the synced documents to the site, so don't run it against a production site.
+"""
+
+import resource
+import sys
+import time
+
+import frappe
+from frappe.utils import flt, now_datetime
+
+from shipstation_integration.client import set_transport
+from shipstation_integration.customer import get_billing_address
+from shipstation_integration.orders import list_orders
+from shipstation_integration.shipments import list_shipments
+from shipstation_integration.shipping import _create_shipping_labels
+from shipstation_integration.telemetry import SyncLog
+from shipstation_integration.tests.fake_shipstation import FakeShipStation
+from shipstation_integration.tests.utils import (
+	create_shipstation_settings,
+	insert_synthetic_addresses,
+)
+
+BENCHMARK_VOLUMES = (1_000, 10_000, 100_000)
+BILLING_ADDRESS_VOLUME = 100_000
+# the fake server reports a budget high enough that requests are never paced
+BENCHMARK_RATE_LIMIT = 1_000_000
+LABEL_VALUES = {
+	"ship_method_type": "Fake Carrier",
+	"service": "Ground",
+	"package": "Package",
+	"gross_weight": 1,
+}
+
+
+def run(volumes: list[int] | None = None, labels: int | None = None) -> list[dict]:
+	"""
+	Run the benchmark at each volume, and print a report of the results.
+	"""
+
+	results = [run_benchmark(volume, labels=labels) for volume in volumes or BENCHMARK_VOLUMES]
+	print_report(results)
+	return results
+
+
+def run_benchmark(volume: int, labels: int | None = None) -> dict:
+	"""
+	Sync `volume` orders and their shipments from a fake Shipstation account, then
+	generate labels for `labels` of the delivery notes (all of them, by default).
+	"""
+
+	# start after any orders synced by earlier runs; a run takes far longer than
+	# a millisecond per thousand orders, so the ID ranges never overlap
+	shipstation = FakeShipStation(
+		orders=volume,
+		order_offset=int(time.time() * 1000) * 1000,
+		rate_limit=BENCHMARK_RATE_LIMIT,
+		record_requests=False,
+	)
+	set_transport(shipstation.transport)
+
+	# the fake orders' items have no stock, so their delivery notes need negative stock
+	allow_negative_stock = frappe.db.get_single_value("Stock Settings", "allow_negative_stock")
+
+	try:
+		settings = create_shipstation_settings()
+		frappe.db.set_single_value("Stock Settings", "allow_negative_stock", 1)
+		frappe.db.commit()
+
+		result = {"volume": volume}
+		started_at = now_datetime()
+
+		result["orders"] = measure(
+			lambda: list_orders(settings), volume, settings.name, "Orders", started_at
+		)
+		result["shipments"] = measure(
+			lambda: list_shipments(settings), volume, settings.name, "Shipments", started_at
+		)
+
+		delivery_notes = frappe.get_all(
+			"Delivery Note",
+			filters={"docstatus": 1, "creation": [">=", started_at], "shipstation_order_id": ["is", "set"]},
+			order_by="creation asc",
+			limit=volume if labels is None else labels,
+			pluck="name",
+		)
+		result["labels"] = measure_labels(delivery_notes)
+	finally:
+		set_transport(None)
+		frappe.db.set_single_value("Stock Settings", "allow_negative_stock", allow_negative_stock)
+		frappe.db.commit()
+
+	return result
+
+
+def measure(sync, volume: int, settings_name: str, sync_type: str, started_at) -> dict:
+	"""
+	Run a sync, and sum up the sync logs it saved for the account.
+	"""
+
+	start = time.perf_counter()
+	sync()
+	elapsed = time.perf_counter() - start
+
+	logs = frappe.get_all(
+		"Shipstation Sync Log",
+		filters={
+			"shipstation_settings": settings_name,
+			"sync_type": sync_type,
+			"started_at": [">=", started_at],
+		},
+		fields=["created", "failed", "queries", "api_calls", "api_time", "db_time"],
+	)
+	return summarize(
+		volume,
+		elapsed,
+		created=sum(log.created for log in logs),
+		failed=sum(log.failed for log in logs),
+		queries=sum(log.queries for log in logs),
+		api_calls=sum(log.api_calls for log in logs),
+		api_time=sum(log.api_time for log in logs),
+		db_time=sum(log.db_time for log in logs),
+	)
+
+
+def measure_labels(delivery_notes: list[str]) -> dict:
+	log = SyncLog("Labels")
+
+	start = time.perf_counter()
+	with log.recording():
+		_create_shipping_labels(delivery_notes, LABEL_VALUES)
+	elapsed = time.perf_counter() - start
+	log.save()
+
+	return summarize(
+		len(delivery_notes),
+		elapsed,
+		created=log.counts["created"],
+		failed=log.counts["failed"],
+		queries=log.queries,
+		api_calls=log.api_calls,
+		api_time=log.api_time,
+		db_time=log.db_time,
+	)
+
+
+def summarize(count: int, elapsed: float, **totals) -> dict:
+	return {
+		"count": count,
+		"seconds": flt(elapsed, 3),
+		"per_second": flt(count / elapsed, 1) if elapsed else 0,
+		"queries_per_order": flt(totals["queries"] / count, 1) if count else 0,
+		# the peak for the whole process so far, since the RSS high-water mark can't be reset
+		"peak_rss_mb": get_peak_rss_mb(),
+		**{key: flt(value, 3) for key, value in totals.items()},
+	}
+
+
+def get_peak_rss_mb() -> float:
+	max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# reported in bytes on macOS, and kilobytes elsewhere
+	return flt(max_rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def print_report(results: list[dict]):
+	header = f"{'volume':>8} {'step':<10} {'count':>8} {'seconds':>10} {'per sec':>9} {'queries/order':>14} {'failed':>7} {'peak RSS (MB)':>14}"
+	print(header)
+	print("-" * len(header))
+
+	for result in results:
+		for step in ("orders", "shipments", "labels"):
+			stats = result[step]
+			print(
+				f"{result['volume']:>8} {step:<10} {stats['count']:>8} {stats['seconds']:>10} "
+				f"{stats['per_second']:>9} {stats['queries_per_order']:>14} "
+				f"{int(stats['failed']):>7} {stats['peak_rss_mb']:>14}"
+			)
+
+
+def run_billing_address_benchmark(addresses: int = BILLING_ADDRESS_VOLUME) -> dict:
+	"""
+	Time billing address lookups against a table of `addresses` synthetic addresses.
+	The addresses are rolled back afterwards.
+	"""
+
+	try:
+		insert_synthetic_addresses(addresses)
+		frappe.local.shipstation_billing_addresses = {}
+		customers = [f"_Test Shipstation Customer {i}" for i in range(0, addresses // 2, 500)]
+
+		start = time.perf_counter()
+		for customer in customers:
+			get_billing_address(customer)
+		elapsed = time.perf_counter() - start
+	finally:
+		frappe.db.rollback()
+		frappe.local.shipstation_billing_addresses = {}
+
+	result = {
+		"addresses": addresses,
+		"lookups": len(customers),
+		"ms_per_lookup": flt(elapsed * 1000 / len(customers), 3) if customers else 0,
+	}
+	print(result)
+	return result
@@ -0,0 +1,416 @@
+import base64
+import datetime
+import json
+import math
+import re
+
+import httpx
+
+from shipstation_integration.shipstation_integration.doctype.shipstation_store.shipstation_store import (
+	get_shipstation_now,
+)
+
+STORE_ID = 100001
+WAREHOUSE_ID = 200001
+# the date fields that list requests can filter on, with `...Start` and `...End` parameters
+DATE_FILTERS = ("createDate", "modifyDate", "voidDate")
+
+
+class FakeShipStation:
+	"""
+	An in-process stand-in for the Shipstation API, serving synthetic data
+	through an `httpx.MockTransport`. Use it with
+	`shipstation_integration.client.set_transport(FakeShipStation().transport)`.
+
+	Order and shipment IDs start after `order_offset`, so repeated runs against the
+	same site can get orders that haven't been synced yet. If a `rate_limit` is set,
+	responses report it in the `X-Rate-Limit-*` headers, like Shipstation does.
+
+	Records are created a millisecond apart from `start_date`, which defaults to just
+	before the fake is created, and list requests are filtered by their dates like
+	Shipstation does. Set an order's `modify_dates` entry to make it show up as
+	modified later.
+	"""
+
+	def __init__(
+		self,
+		orders: int = 10,
+		store_id: int = STORE_ID,
+		order_offset: int = 0,
+		rate_limit: int | None = None,
+		record_requests: bool = True,
+	):
+		self.order_count = orders
+		self.store_id = store_id
+		self.order_offset = order_offset
+		self.rate_limit = rate_limit
+		self.record_requests = record_requests
+		self.start_date = get_shipstation_now() - datetime.timedelta(milliseconds=orders)
+		self.modify_dates: dict[int, datetime.datetime] = {}
+		self.requests: list[httpx.Request] = []
+		self.label_data = base64.b64encode(make_label_pdf()).decode()
+		self.transport = httpx.MockTransport(self.handle)
+
+	def handle(self, request: httpx.Request) -> httpx.Response:
+		if self.record_requests:
+			self.requests.append(request)
+
+		response = self.route(request)
+		if self.rate_limit:
+			response.headers.update(
+				{
+					"X-Rate-Limit-Limit": str(self.rate_limit),
+					"X-Rate-Limit-Remaining": str(self.rate_limit),
+					"X-Rate-Limit-Reset": "60",
+				}
+			)
+		return response
+
+	def route(self, request: httpx.Request) -> httpx.Response:
+		params = {key.lower(): value for key, value in request.url.params.items()}
+		path = request.url.path.rstrip("/")
+
+		if path == "/orders":
+			return self.paginate("orders", self.order, params)
+		if path == "/shipments":
+			return self.paginate("shipments", self.shipment, params)
+		if path == "/orders/createlabelfororder":
+			return httpx.Response(200, json=self.label(json.loads(request.content)))
+		if match := re.fullmatch(r"/orders/(\d+)", path):
+			return httpx.Response(200, json=self.order(self.get_index(match.group(1))))
+		if path == "/carriers":
+			return httpx.Response(200, json=self.carriers())
+		if path in ("/carriers/listservices", "/carriers/listpackages"):
+			return httpx.Response(200, json=self.carrier_options(params.get("carriercode"), path))
+		if path == "/stores":
+			return httpx.Response(200, json=self.stores())
+		if path == "/warehouses":
+			return httpx.Response(200, json=self.warehouses())
+
+		return httpx.Response(404, json={"Message": f"No fake resource for {path}"})
+
+	def paginate(self, key: str, make_record, params: dict) -> httpx.Response:
+		page = int(params.get("page") or 1)
+		page_size = int(params.get("pagesize") or 100)
+		start = (page - 1) * page_size
+
+		date_filters = get_date_filters(params)
+		indexes = [
+			index
+			for index in range(self.order_count)
+			if matches_date_filters(self.get_dates(index), date_filters)
+		]
+		records = [make_record(index) for index in indexes[start : start + page_size]]
+
+		return httpx.Response(
+			200,
+			json={
+				key: records,
+				"total": len(indexes),
+				"page": page,
+				"pages": math.ceil(len(indexes) / page_size),
+			},
+		)
+
+	def get_dates(self, index: int) -> dict[str, datetime.datetime | None]:
+		create_date = self.start_date + datetime.timedelta(milliseconds=index)
+		return {
+			"createDate": create_date,
+			"modifyDate": self.modify_dates.get(index, create_date),
+			"voidDate": None,
+		}
+
+	def get_index(self, order_id: int | str) -> int:
+		return int(order_id) - self.order_offset - 1
+
+	def order(self, index: int) -> dict:
+		order_id = self.order_offset + index + 1
+		dates = self.get_dates(index)
+		order_date = dates["createDate"].isoformat()
+		email = f"customer{index % 50}@example.com"
+		return {
+			"orderId": order_id,
+			"orderNumber": f"FAKE-{order_id}",
+			"orderKey": f"fake-{order_id}",
+			"orderDate": order_date,
+			"createDate": order_date,
+			"modifyDate": dates["modifyDate"].isoformat(),
+			"paymentDate": order_date,
+			"shipByDate": None,
+			"orderStatus": "awaiting_shipment",
+			"customerId": index % 50 + 1,
+			"customerUsername": email,
+			"customerEmail": email,
+			"billTo": self.address(index),
+			"shipTo": self.address(index),
+			"items": [self.order_item(index, line) for line in range(2)],
+			"orderTotal": 25.0,
+			"amountPaid": 25.0,
+			"taxAmount": 2.0,
+			"shippingAmount": 3.0,
+			"customerNotes": None,
+			"internalNotes": None,
+			"gift": False,
+			"giftMessage": None,
+			"paymentMethod": None,
+			"requestedShippingService": None,
+			"carrierCode": None,
+			"serviceCode": None,
+			"packageCode": None,
+			"confirmation": "none",
+			"shipDate": order_date,
+			"holdUntilDate": None,
+			"weight": {"value": 16, "units": "ounces", "WeightUnits": 1},
+			"dimensions": None,
+			"insuranceOptions": {"provider": None, "insureShipment": False, "insuredValue": 0},
+			"internationalOptions": {"contents": None, "customsItems": None, "nonDelivery": None},
+			"advancedOptions": {
+				"warehouseId": WAREHOUSE_ID,
+				"nonMachinable": False,
+				"saturdayDelivery": False,
+				"containsAlcohol": False,
+				"mergedOrSplit": False,
+				"mergedIds": [],
+				"parentId": None,
+				"storeId": self.store_id,
+				"customField1": None,
+				"customField2": None,
+				"customField3": None,
+				"source": None,
+				"billToParty": None,
+				"billToAccount": None,
+				"billToPostalCode": None,
+				"billToCountryCode": None,
+			},
+			"tagIds": None,
+			"userId": None,
+			"externallyFulfilled": False,
+			"externallyFulfilledBy": None,
+		}
+
+	def order_item(self, index: int, line: int) -> dict:
+		sku = f"FAKE-SKU-{(index + line) % 25}"
+		return {
+			"orderItemId": (self.order_offset + index + 1) * 10 + line,
+			"lineItemKey": f"line-{line}",
+			"sku": sku,
+			"name": f"Fake Item {sku}",
+			"imageUrl": None,
+			"weight": {"value": 8, "units": "ounces", "WeightUnits": 1},
+			"quantity": 1,
+			"unitPrice": 10.0,
+			"taxAmount": None,
+			"shippingAmount": None,
+			"warehouseLocation": None,
+			"options": [{"name": "Color", "value": "Blue"}],
+			"productId": None,
+			"fulfillmentSku": None,
+			"adjustment": False,
+			"upc": None,
+			"createDate": self.start_date.isoformat(),
+			"modifyDate": self.start_date.isoformat(),
+		}
+
+	def shipment(self, index: int) -> dict:
+		order = self.order(index)
+		return {
+			"shipmentId": order["orderId"],
+			"orderId": order["orderId"],
+			"orderKey": order["orderKey"],
+			"userId": None,
+			"customerEmail": order["customerEmail"],
+			"orderNumber": order["orderNumber"],
+			"createDate": order["createDate"],
+			"shipDate": order["shipDate"],
+			"shipmentCost": 4.5,
+			"insuranceCost": 0,
+			"trackingNumber": f"1Z{order['orderId']:016d}",
+			"isReturnLabel": False,
+			"batchNumber": None,
+			"carrierCode": "fake_carrier",
+			"serviceCode": "fake_ground",
+			"packageCode": "package",
+			"confirmation": "none",
+			"warehouseId": WAREHOUSE_ID,
+			"voided": False,
+			"voidDate": None,
+			"marketplaceNotified": True,
+			"notifyErrorMessage": None,
+			"shipTo": order["shipTo"],
+			"weight": order["weight"],
+			"dimensions": {"units": "inches", "length": 10, "width": 8, "height": 4},
+			"insuranceOptions": order["insuranceOptions"],
+			"advancedOptions": {"billToParty": None, "storeId": self.store_id},
+			"shipmentItems": [
+				{
+					"orderItemId": item["orderItemId"],
+					"lineItemKey": item["lineItemKey"],
+					"sku": item["sku"],
+					"name": item["name"],
+					"quantity": item["quantity"],
+					"unitPrice": item["unitPrice"],
+				}
+				for item in order["items"]
+			],
+			"labelData": None,
+			"formData": None,
+		}
+
+	def label(self, order: dict) -> dict:
+		"""
+		The shipment for a label generated with `createlabelfororder`.
+		"""
+
+		shipment = self.shipment(self.get_index(order["orderId"]))
+		shipment.update(
+			{
+				"carrierCode": order.get("carrierCode") or shipment["carrierCode"],
+				"serviceCode": order.get("serviceCode") or shipment["serviceCode"],
+				"packageCode": order.get("packageCode") or shipment["packageCode"],
+				"labelData": self.label_data,
+			}
+		)
+		return shipment
+
+	def address(self, index: int) -> dict:
+		return {
+			"name": f"Fake Customer {index % 50}",
+			"company": None,
+			"street1": f"{index % 50} Fake Street",
+			"street2": None,
+			"street3": None,
+			"city": "Springfield",
+			"state": "IL",
+			"postalCode": "62701",
+			"country": "US",
+			"phone": "555-0100",
+			"residential": True,
+			"addressVerified": None,
+		}
+
+	def carriers(self) -> list[dict]:
+		return [
+			{
+				"name": "Fake Carrier",
+				"code": "fake_carrier",
+				"accountNumber": "FAKE123",
+				"requiresFundedAccount": False,
+				"balance": 0,
+				"nickname": None,
+				"shippingProviderId": 1,
+				"primary": True,
+			}
+		]
+
+	def carrier_options(self, carrier_code: str, path: str) -> list[dict]:
+		names = ["Ground", "Express"] if path.endswith("listservices") else ["Package", "Flat Rate Box"]
+		return [
+			{
+				"carrierCode": carrier_code,
+				"code": f"fake_{name.lower().replace(' ', '_')}",
+				"name": name,
+				"domestic": True,
+				"international": False,
+			}
+			for name in names
+		]
+
+	def stores(self) -> list[dict]:
+		return [
+			{
+				"storeId": self.store_id,
+				"storeName": "Fake Store",
+				"marketplaceId": 0,
+				"marketplaceName": "ShipStation",
+				"accountName": None,
+				"email": None,
+				"integrationUrl": None,
+				"active": True,
+				"companyName": "",
+				"phone": "",
+				"publicEmail": "",
+				"website": "",
+				"refreshDate": None,
+				"lastRefreshAttempt": None,
+				"createDate": self.start_date.isoformat(),
+				"modifyDate": self.start_date.isoformat(),
+				"autoRefresh": False,
+				"statusMappings": None,
+			}
+		]
+
+	def warehouses(self) -> list[dict]:
+		return [
+			{
+				"warehouseId": WAREHOUSE_ID,
+				"warehouseName": "Fake Warehouse",
+				"originAddress": self.address(0),
+				"returnAddress": self.address(0),
+				"createDate": self.start_date.isoformat(),
+				"isDefault": True,
+			}
+		]
+
+	def webhook(self, resource_type: str = "ORDER_NOTIFY") -> dict:
+		"""
+		A webhook notification, as Shipstation would post it.
+		"""
+
+		resource = "orders" if resource_type == "ORDER_NOTIFY" else "shipments"
+		return {
+			"resource_url": f"https://ssapi.shipstation.com/{resource}?storeID={self.store_id}&importBatch=fake-batch",
+			"resource_type": resource_type,
+		}
+
+
+def make_label_pdf() -> bytes:
+	"""
+	A minimal, valid single page PDF (4x6 inches) to stand in for a shipping label.
+	"""
+
+	objects = [
+		b"<< /Type /Catalog /Pages 2 0 R >>",
+		b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+		b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 288 432] >>",
+	]
+
+	pdf = b"%PDF-1.4\n"
+	offsets = []
+	for number, obj in enumerate(objects, start=1):
+		offsets.append(len(pdf))
+		pdf += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+
+	xref_offset = len(pdf)
+	pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+	pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+	pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+		len(objects) + 1,
+		xref_offset,
+	)
+	return pdf
+
+
+def get_date_filters(
+	params: dict,
+) -> dict[str, tuple[datetime.datetime | None, datetime.datetime | None]]:
+	date_filters = {}
+	for field in DATE_FILTERS:
+		start = params.get(f"{field.lower()}start")
+		end = params.get(f"{field.lower()}end")
+		if start or end:
+			date_filters[field] = (parse_date(start), parse_date(end))
+	return date_filters
+
+
+def matches_date_filters(dates: dict, date_filters: dict) -> bool:
+	for field, (start, end) in date_filters.items():
+		date = dates[field]
+		if not date or (start and date < start) or (end and date > end):
+			return False
+	return True
+
+
+def parse_date(value: str | None) -> datetime.datetime | None:
+	if not value:
+		return None
+	return datetime.datetime.fromisoformat(value).replace(tzinfo=None)
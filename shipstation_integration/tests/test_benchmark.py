@@ -0,0 +1,15 @@
+from frappe.tests.utils import FrappeTestCase
+
+from shipstation_integration.tests.benchmark import run_benchmark
+
+
+class TestBenchmark(FrappeTestCase):
+	def test_benchmark_runs_end_to_end(self):
+		result = run_benchmark(10, labels=3)
+
+		self.assertEqual(result["orders"]["created"], 10)
+		self.assertEqual(result["orders"]["failed"], 0)
+		self.assertEqual(result["labels"]["count"], 3)
+		self.assertEqual(result["labels"]["created"], 3)
+		self.assertGreater(result["orders"]["queries_per_order"], 0)
+		self.assertGreater(result["labels"]["peak_rss_mb"], 0)
@@ -0,0 +1,53 @@
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from shipstation_integration.carriers import get_carrier_data_hash, get_carrier_index
+
+CARRIER_DATA = json.dumps(
+	[
+		{
+			"name": "Fake Carrier",
+			"nickname": "Fake",
+			"code": "fake_carrier",
+			"account_number": "FAKE123",
+			"primary": True,
+			"services": [
+				{"name": "Ground", "code": "fake_ground"},
+				{"name": "Express", "code": "fake_express"},
+			],
+			"packages": [
+				{"name": "Package", "code": "package"},
+				{"name": "Flat Rate Box", "code": "fake_flat_rate_box"},
+			],
+		}
+	]
+)
+
+
+class TestCarrierIndex(FrappeTestCase):
+	def test_get_codes(self):
+		settings = frappe.new_doc("Shipstation Settings")
+		settings.carrier_data = CARRIER_DATA
+
+		self.assertEqual(
+			settings.get_codes("Fake Carrier", "Express", "Flat Rate Box"),
+			("fake_carrier", "fake_express", "fake_flat_rate_box"),
+		)
+		self.assertEqual(
+			settings.get_codes("Fake", "Ground", None), ("fake_carrier", "fake_ground", "Package")
+		)
+		self.assertEqual(settings.get_codes("Unknown", "Ground", None), (None, None, "Package"))
+		self.assertEqual(settings.get_carrier_services("Fake"), "Ground\nExpress")
+
+	def test_index_is_cached_by_carrier_data(self):
+		get_carrier_index(CARRIER_DATA)
+
+		cached_index = frappe.cache().get_value(
+			f"shipstation_carrier_index|{get_carrier_data_hash(CARRIER_DATA)}"
+		)
+		self.assertEqual(
+			cached_index["options"][0]["services"], [{"name": "Ground"}, {"name": "Express"}]
+		)
+		self.assertNotIn("code", cached_index["options"][0])
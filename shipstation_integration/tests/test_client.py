@@ -0,0 +1,141 @@
+from unittest.mock import patch
+
+import frappe
+import httpx
+from frappe.tests.utils import FrappeTestCase
+
+from shipstation_integration.client import (
+	RATE_LIMIT_RETRIES,
+	PooledShipStation,
+	RateLimiter,
+	get_throttling,
+)
+from shipstation_integration.telemetry import SyncLog
+
+
+class FakeClock:
+	"""
+	Stands in for the `time` module in the client, so waiting on the rate limiter
+	advances the clock instead of sleeping.
+	"""
+
+	def __init__(self):
+		self.now = 1000.0
+		self.sleeps: list[float] = []
+
+	def monotonic(self) -> float:
+		return self.now
+
+	def sleep(self, seconds: float):
+		self.sleeps.append(seconds)
+		self.now += seconds
+
+
+def rate_limited_response(status_code: int = 200, remaining: int = 40, reset: int = 30):
+	return httpx.Response(
+		status_code,
+		headers={
+			"X-Rate-Limit-Limit": "40",
+			"X-Rate-Limit-Remaining": str(remaining),
+			"X-Rate-Limit-Reset": str(reset),
+		},
+		json={},
+	)
+
+
+class TestRateLimiter(FrappeTestCase):
+	def setUp(self):
+		self.clock = FakeClock()
+		patcher = patch("shipstation_integration.client.time", self.clock)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_requests_wait_for_the_bucket_to_refill(self):
+		limiter = RateLimiter(limit=40, period=60)
+		throttled_requests, throttled_time = get_throttling()
+
+		for _ in range(40):
+			limiter.acquire()
+		self.assertEqual(self.clock.sleeps, [])
+
+		# one token comes back every 1.5 seconds
+		limiter.acquire()
+		self.assertEqual(self.clock.sleeps, [1.5])
+
+		self.clock.now += 3
+		limiter.acquire()
+		limiter.acquire()
+		self.assertEqual(self.clock.sleeps, [1.5])
+
+		requests, seconds = get_throttling()
+		self.assertEqual(requests - throttled_requests, 1)
+		self.assertAlmostEqual(seconds - throttled_time, 1.5)
+
+	def test_bucket_is_corrected_from_headers(self):
+		limiter = RateLimiter(limit=40, period=60)
+
+		# another process has used up most of the budget for the key
+		limiter.update(rate_limited_response(remaining=2))
+		limiter.acquire()
+		limiter.acquire()
+		self.assertEqual(self.clock.sleeps, [])
+
+		# once the budget is used up, requests are held back until the reset
+		limiter.update(rate_limited_response(remaining=0, reset=30))
+		limiter.acquire()
+		self.assertEqual(self.clock.sleeps, [30])
+
+	def test_limit_is_read_from_headers(self):
+		limiter = RateLimiter(limit=40, period=60)
+		limiter.update(
+			httpx.Response(200, headers={"X-Rate-Limit-Limit": "120", "X-Rate-Limit-Reset": "60"})
+		)
+		self.assertEqual(limiter.limit, 120)
+
+	def test_throttling_is_recorded_on_the_sync_log(self):
+		log = SyncLog("Orders")
+		acquire = log.timed_api(RateLimiter(limit=1, period=60).acquire)
+
+		acquire()
+		acquire()
+		log.save()
+
+		self.assertEqual(
+			frappe.db.get_value("Shipstation Sync Log", log.name, ["throttled_requests", "throttled_time"]),
+			(1, 60),
+		)
+
+	def test_rate_limited_requests_are_retried(self):
+		responses = [rate_limited_response(429, remaining=0, reset=30), rate_limited_response()]
+		requests = []
+
+		def handle(request: httpx.Request) -> httpx.Response:
+			requests.append(request)
+			return responses.pop(0)
+
+		client = self.get_client(handle)
+		response = client.get("/orders")
+
+		self.assertEqual(response.status_code, 200)
+		self.assertEqual(len(requests), 2)
+		self.assertEqual(self.clock.sleeps, [30])
+
+	def test_rate_limited_requests_give_up_after_retries(self):
+		requests = []
+
+		def handle(request: httpx.Request) -> httpx.Response:
+			requests.append(request)
+			return rate_limited_response(429, remaining=0, reset=30)
+
+		client = self.get_client(handle)
+		with self.assertRaises(httpx.HTTPStatusError):
+			client.get("/orders")
+
+		self.assertEqual(len(requests), RATE_LIMIT_RETRIES + 1)
+
+	def get_client(self, handle) -> PooledShipStation:
+		session = httpx.Client(transport=httpx.MockTransport(handle))
+		self.addCleanup(session.close)
+		return PooledShipStation(
+			session, RateLimiter(limit=40, period=60), key="key", secret="secret", debug=False
+		)
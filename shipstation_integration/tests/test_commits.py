@@ -0,0 +1,22 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from shipstation_integration.commits import CommitBatch
+from shipstation_integration.customer import get_billing_address_cache
+from shipstation_integration.items import get_item_code_cache, get_stock_uom_cache
+
+
+class TestCommitBatch(FrappeTestCase):
+	def test_failed_document_clears_run_caches(self):
+		commit_batch = CommitBatch()
+
+		with commit_batch.savepoint("_Test Shipstation savepoint"):
+			get_item_code_cache().set(("item_code", "_TEST-SKU"), "_Test Missing Item")
+			get_billing_address_cache()["_Test Customer"] = "_Test Missing Address"
+			get_stock_uom_cache()["_Test Missing Item"] = "Nos"
+			raise frappe.ValidationError
+
+		self.assertEqual(commit_batch.failed, 1)
+		self.assertIsNone(get_item_code_cache().get(("item_code", "_TEST-SKU")))
+		self.assertNotIn("_Test Customer", get_billing_address_cache())
+		self.assertNotIn("_Test Missing Item", get_stock_uom_cache())
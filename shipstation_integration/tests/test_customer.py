@@ -0,0 +1,83 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from shipstation_integration.customer import (
+	create_or_update_address,
+	get_billing_address,
+	get_billing_address_query,
+)
+from shipstation_integration.tests.utils import insert_synthetic_addresses
+
+SYNTHETIC_ADDRESSES = 20
+ADDRESS_DATA = frappe._dict(
+	street1="1 Fingerprint Way",
+	street2=None,
+	street3=None,
+	city="Springfield",
+	state="IL",
+	postal_code="62701",
+	country="US",
+	phone="555-0100",
+)
+
+
+class TestBillingAddress(FrappeTestCase):
+	@classmethod
+	def setUpClass(cls):
+		super().setUpClass()
+		insert_synthetic_addresses(SYNTHETIC_ADDRESSES)
+
+	def setUp(self):
+		frappe.local.shipstation_billing_addresses = {}
+
+	def test_billing_address_is_linked_to_customer(self):
+		self.assertEqual(
+			get_billing_address("_Test Shipstation Customer 4"), "_Test Shipstation Address 9"
+		)
+		self.assertIsNone(get_billing_address("_Test Shipstation Customer Missing"))
+
+	def test_billing_address_lookup_uses_indexes(self):
+		if frappe.db.db_type != "mariadb":
+			self.skipTest("The query plan is only checked on MariaDB")
+
+		query_plan = frappe.db.sql(
+			f"EXPLAIN {get_billing_address_query('_Test Shipstation Customer 4').get_sql()}",
+			as_dict=True,
+		)
+		keys = {row.table: row.key for row in query_plan}
+
+		# a plan without keys scans the whole table, for every order synced
+		self.assertTrue(keys["tabDynamic Link"])
+		self.assertEqual(keys["tabAddress"], "PRIMARY")
+
+	def test_billing_address_lookup_is_cached(self):
+		get_billing_address("_Test Shipstation Customer 1")
+		with self.assertQueryCount(0):
+			get_billing_address("_Test Shipstation Customer 1")
+
+
+class TestAddressSync(FrappeTestCase):
+	def sync_address(self):
+		return create_or_update_address(
+			ADDRESS_DATA, "_Test Customer", "customer@example.com", "Shipping"
+		)
+
+	def test_unchanged_address_is_not_saved(self):
+		address = self.sync_address()
+		modified = frappe.db.get_value("Address", address.name, "modified")
+
+		self.assertEqual(self.sync_address().name, address.name)
+		self.assertEqual(frappe.db.get_value("Address", address.name, "modified"), modified)
+
+	def test_edited_address_is_updated_by_the_next_sync(self):
+		address = self.sync_address()
+
+		edited = frappe.get_doc("Address", address.name)
+		edited.city = "Shelbyville"
+		edited.save()
+		self.assertFalse(edited.shipstation_address_hash)
+
+		self.assertEqual(self.sync_address().name, address.name)
+		synced = frappe.get_doc("Address", address.name)
+		self.assertEqual(synced.city, "Springfield")
+		self.assertEqual(synced.shipstation_address_hash, address.shipstation_address_hash)
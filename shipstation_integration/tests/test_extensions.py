@@ -0,0 +1,44 @@
+from collections import Counter
+from unittest.mock import patch
+
+import frappe
+
+from shipstation_integration.extensions import SHIPSTATION_HOOKS, HookRegistry
+from shipstation_integration.orders import list_orders
+from shipstation_integration.tests.utils import ShipstationTestCase
+
+get_hooks = frappe.get_hooks
+
+
+def passthrough(*args):
+	return args[-1]
+
+
+def get_test_hooks(hook=None, *args, **kwargs):
+	# register a handler for every extension point, on top of the site's actual hooks
+	if hook in SHIPSTATION_HOOKS:
+		return get_hooks(hook) or ["shipstation_integration.tests.test_extensions.passthrough"]
+	return get_hooks(hook, *args, **kwargs)
+
+
+class TestHookRegistry(ShipstationTestCase):
+	def test_hooks_are_resolved_to_callables(self):
+		with patch("frappe.get_hooks", side_effect=get_test_hooks):
+			hooks = HookRegistry()
+
+		for hook in SHIPSTATION_HOOKS:
+			self.assertTrue(callable(hooks.get(hook)))
+
+	def test_hooks_are_resolved_once_per_run(self):
+		with patch("frappe.get_hooks", side_effect=get_test_hooks) as mock_get_hooks:
+			list_orders(self.settings)
+
+		resolved_hooks = Counter(
+			hook
+			for hook in (
+				call.kwargs.get("hook", call.args[0] if call.args else None)
+				for call in mock_get_hooks.call_args_list
+			)
+			if hook in SHIPSTATION_HOOKS
+		)
+		self.assertEqual(resolved_hooks, Counter(SHIPSTATION_HOOKS))
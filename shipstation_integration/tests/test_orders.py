@@ -0,0 +1,72 @@
+import datetime
+from unittest.mock import patch
+
+import frappe
+
+from shipstation_integration.orders import list_orders
+from shipstation_integration.shipstation_integration.doctype.shipstation_store.shipstation_store import (
+	get_shipstation_now,
+)
+from shipstation_integration.tests.fake_shipstation import STORE_ID
+from shipstation_integration.tests.utils import ShipstationTestCase
+
+
+class TestListOrders(ShipstationTestCase):
+	fake_orders = 3
+
+	def get_last_order_sync(self):
+		return frappe.db.get_value(
+			"Shipstation Store", {"parent": self.settings.name, "store_id": STORE_ID}, "last_order_sync"
+		)
+
+	def test_failed_orders_are_retried(self):
+		with patch(
+			"shipstation_integration.orders.create_erpnext_order", side_effect=frappe.ValidationError
+		):
+			list_orders(self.settings)
+
+		self.assertIsNone(self.get_last_order_sync())
+
+		list_orders(self.settings)
+
+		self.assertIsNotNone(self.get_last_order_sync())
+		order_ids = [str(self.shipstation.order(index)["orderId"]) for index in range(3)]
+		self.assertEqual(frappe.db.count("Sales Order", {"shipstation_order_id": ["in", order_ids]}), 3)
+
+	def test_orders_modified_after_a_sync_are_fetched(self):
+		# outside the overlap with the previous window, so the next run doesn't re-fetch them
+		self.shipstation.start_date = get_shipstation_now() - datetime.timedelta(hours=1)
+		list_orders(self.settings)
+
+		# one order is modified and another one is created after the first run
+		self.shipstation.modify_dates[0] = get_shipstation_now()
+		self.shipstation.order_count = 4
+		self.shipstation.modify_dates[3] = get_shipstation_now()
+
+		list_orders(self.settings)
+
+		fetched = frappe.get_all(
+			"Shipstation Sync Log",
+			filters={
+				"shipstation_settings": self.settings.name,
+				"sync_type": "Orders",
+				"started_at": [">=", self.started_at],
+			},
+			order_by="started_at asc",
+			pluck="fetched",
+		)
+		self.assertEqual(fetched, [3, 2])
+		order_ids = [str(self.shipstation.order(index)["orderId"]) for index in range(4)]
+		self.assertEqual(frappe.db.count("Sales Order", {"shipstation_order_id": ["in", order_ids]}), 4)
+
+	def test_warehouses_without_shipstation_ids_match_no_orders(self):
+		frappe.db.set_value("Warehouse", "_Test Warehouse - _TC", "shipstation_warehouse_id", None)
+		self.settings.append("shipstation_warehouses", {"warehouse": "_Test Warehouse - _TC"})
+		self.settings.save()
+
+		self.assertEqual(self.settings.active_warehouse_ids, {None})
+
+		list_orders(self.settings)
+
+		order_ids = [str(self.shipstation.order(index)["orderId"]) for index in range(3)]
+		self.assertEqual(frappe.db.count("Sales Order", {"shipstation_order_id": ["in", order_ids]}), 0)
@@ -0,0 +1,35 @@
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from shipstation_integration.setup import create_search_indexes
+
+
+class TestSearchIndexes(FrappeTestCase):
+	def setUp(self):
+		if frappe.db.db_type != "mariadb":
+			self.skipTest("Online index creation is only supported on MariaDB")
+
+	def get_possible_keys(self, doctype: str, fieldname: str) -> str:
+		query_plan = frappe.db.sql(
+			f"EXPLAIN SELECT `name` FROM `tab{doctype}` WHERE `{fieldname}` = %s",
+			("123456789",),
+			as_dict=True,
+		)
+		return query_plan[0].possible_keys or ""
+
+	def test_order_id_lookup_uses_index(self):
+		index_name = "shipstation_order_id_index"
+		if frappe.db.has_index("tabSales Order", index_name):
+			frappe.db.sql_ddl(f"ALTER TABLE `tabSales Order` DROP INDEX `{index_name}`")
+
+		self.assertNotIn(index_name, self.get_possible_keys("Sales Order", "shipstation_order_id"))
+
+		create_search_indexes()
+
+		self.assertIn(index_name, self.get_possible_keys("Sales Order", "shipstation_order_id"))
+
+	def test_create_search_indexes_is_idempotent(self):
+		create_search_indexes()
+		create_search_indexes()
+
+		self.assertTrue(frappe.db.has_index("tabDelivery Note", "shipstation_shipment_id_index"))
@@ -0,0 +1,56 @@
+import json
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from shipstation_integration import telemetry
+from shipstation_integration.telemetry import Profiler, SyncLog
+
+
+class TestSyncLog(FrappeTestCase):
+	def test_sync_log_records_run(self):
+		log = SyncLog("Orders")
+		log.set_window("2026-01-01 00:00:00", "2026-01-01 01:00:00")
+
+		with log.recording():
+			with telemetry.phase("validate"):
+				frappe.db.sql("SELECT 1")
+			telemetry.count("fetched", 3)
+			telemetry.count("created", 2)
+			telemetry.count("skipped")
+			log.timed_api(lambda: None)()
+
+		# nothing is recorded once the log stops recording
+		telemetry.count("created")
+		frappe.db.sql("SELECT 1")
+
+		sync_log = log.save()
+		self.assertEqual(sync_log.status, "Success")
+		self.assertEqual((sync_log.fetched, sync_log.created, sync_log.skipped), (3, 2, 1))
+		self.assertEqual((sync_log.api_calls, sync_log.queries), (1, 1))
+		self.assertIn("validate", json.loads(sync_log.phase_timings))
+		self.assertEqual(str(sync_log.window_start), "2026-01-01 00:00:00")
+
+	def test_failed_run(self):
+		log = SyncLog("Shipments")
+		log.fail("Shipstation is down")
+		self.assertEqual(log.save().status, "Failed")
+
+	def test_profiled_run_attaches_profile(self):
+		profiler = Profiler().start()
+		log = SyncLog("Orders")
+		with log.recording():
+			frappe.db.sql("SELECT 1")
+
+		sync_log = log.save()
+		profiler.save(log)
+		attachments = frappe.get_all(
+			"File",
+			filters={"attached_to_doctype": sync_log.doctype, "attached_to_name": sync_log.name},
+			fields=["file_name", "is_private"],
+		)
+		self.assertEqual(
+			sorted(file.file_name for file in attachments),
+			[f"{sync_log.name}.collapsed.txt", f"{sync_log.name}.prof"],
+		)
+		self.assertTrue(all(file.is_private for file in attachments))
@@ -0,0 +1,61 @@
+import frappe
+
+from shipstation_integration.tests.utils import ShipstationTestCase
+from shipstation_integration.webhooks import handle_webhook, process_webhook
+
+
+class TestWebhooks(ShipstationTestCase):
+	settings_values = {"enable_webhooks": 1}
+
+	def test_webhook_url_is_generated(self):
+		self.assertTrue(self.settings.webhook_token)
+		self.assertIn(self.settings.webhook_token, self.settings.webhook_url)
+
+	def test_invalid_token_is_rejected(self):
+		with self.assertRaises(frappe.AuthenticationError):
+			handle_webhook(settings=self.settings.name, token="invalid", **self.shipstation.webhook())
+
+	def test_unknown_account_is_rejected_like_an_invalid_token(self):
+		with self.assertRaises(frappe.AuthenticationError):
+			handle_webhook(
+				settings="_Test Unknown Shipstation", token="invalid", **self.shipstation.webhook()
+			)
+
+	def test_foreign_resource_url_is_rejected(self):
+		notification = self.shipstation.webhook()
+		notification["resource_url"] = "https://example.com/orders?storeID=100001"
+
+		with self.assertRaises(frappe.ValidationError):
+			handle_webhook(settings=self.settings.name, token=self.settings.webhook_token, **notification)
+
+	def test_order_notification_creates_orders(self):
+		notification = self.shipstation.webhook("ORDER_NOTIFY")
+		response = handle_webhook(
+			settings=self.settings.name, token=self.settings.webhook_token, **notification
+		)
+		self.assertEqual(response["status"], "queued")
+
+		process_webhook(settings=self.settings.name, **notification)
+
+		self.assertEqual(
+			frappe.db.count("Sales Order", {"shipstation_order_id": ["in", ["1", "2", "3", "4", "5"]]}),
+			5,
+		)
+
+	def test_batch_is_fetched_once(self):
+		notification = self.shipstation.webhook("ORDER_NOTIFY")
+		self.shipstation.requests.clear()
+
+		process_webhook(settings=self.settings.name, **notification)
+
+		self.assertEqual([request.url.path for request in self.shipstation.requests], ["/orders"])
+
+	def test_empty_batch_is_ignored(self):
+		self.shipstation.order_count = 0
+
+		process_webhook(settings=self.settings.name, **self.shipstation.webhook("ORDER_NOTIFY"))
+		process_webhook(settings=self.settings.name, **self.shipstation.webhook("SHIP_NOTIFY"))
+
+		created = {"creation": [">=", self.started_at]}
+		for doctype in ("Sales Order", "Delivery Note", "Customer", "Shipstation Sync Log", "Error Log"):
+			self.assertEqual(frappe.db.count(doctype, created), 0, doctype)
@@ -0,0 +1,145 @@
+import datetime
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import now_datetime
+
+from shipstation_integration.client import set_transport
+from shipstation_integration.setup import setup_shipstation
+from shipstation_integration.tests.fake_shipstation import STORE_ID, FakeShipStation
+
+TEST_SETTINGS = "_Test Shipstation"
+TEST_COMPANY = "_Test Company"
+# the documents that a sync creates, in an order they can be deleted in
+SYNCED_DOCTYPES = ("Sales Order", "Customer", "Address", "Contact", "Item", "Shipstation Sync Log")
+
+
+class ShipstationTestCase(FrappeTestCase):
+	"""
+	Runs each test against a fresh test account, with its requests served by a
+	`FakeShipStation`. The sync commits the documents it creates, so they're
+	deleted after each test.
+	"""
+
+	fake_orders = 5
+	settings_values: dict = {}
+
+	def setUp(self):
+		self.started_at = now_datetime()
+		self.shipstation = FakeShipStation(orders=self.fake_orders)
+		set_transport(self.shipstation.transport)
+		self.settings = create_shipstation_settings(**self.settings_values)
+
+	def tearDown(self):
+		set_transport(None)
+		delete_synced_documents(self.started_at)
+
+
+def create_shipstation_settings(**kwargs):
+	"""
+	Create a Shipstation account with a single store, set up to sync orders and
+	shipments into the test company. Requests should go to a fake Shipstation
+	server (see `FakeShipStation`).
+	"""
+
+	setup_shipstation()
+	if not frappe.db.exists("Territory", "United States"):
+		frappe.get_doc(
+			{
+				"doctype": "Territory",
+				"territory_name": "United States",
+				"parent_territory": "All Territories",
+			}
+		).insert()
+
+	if frappe.db.exists("Shipstation Settings", TEST_SETTINGS):
+		frappe.delete_doc("Shipstation Settings", TEST_SETTINGS, force=True)
+
+	settings = frappe.get_doc(
+		{
+			"doctype": "Shipstation Settings",
+			"__newname": TEST_SETTINGS,
+			"enabled": 1,
+			"api_key": "_test_key",
+			"api_secret": "_test_secret",
+			"default_item_group": "All Item Groups",
+			"hours_to_fetch": 24,
+			**kwargs,
+		}
+	).insert()
+
+	for store in settings.shipstation_stores:
+		if str(store.store_id) != str(STORE_ID):
+			continue
+
+		store.update(
+			{
+				"company": TEST_COMPANY,
+				"enable_orders": 1,
+				"enable_shipments": 1,
+				"create_delivery_note": 1,
+				"warehouse": "_Test Warehouse - _TC",
+				"cost_center": "_Test Cost Center - _TC",
+				"tax_account": "_Test Account VAT - _TC",
+				"sales_account": "Sales - _TC",
+				"expense_account": "_Test Account Cost for Goods Sold - _TC",
+				"shipping_income_account": "_Test Account Shipping Charges - _TC",
+				"shipping_expense_account": "_Test Account Shipping Charges - _TC",
+			}
+		)
+
+	settings.shipstation_warehouses = []
+	settings.save()
+	return settings
+
+
+def insert_synthetic_addresses(count: int):
+	"""
+	Bulk insert `count` addresses, alternating between Shipping and Billing, with each
+	pair linked to the same customer.
+	"""
+
+	addresses, links = [], []
+	for i in range(count):
+		address_name = f"_Test Shipstation Address {i}"
+		address_type = "Billing" if i % 2 else "Shipping"
+		addresses.append((address_name, address_name, address_type, f"{i} Main St", "Springfield"))
+		links.append(
+			(
+				frappe.generate_hash(length=10),
+				address_name,
+				"Address",
+				"links",
+				"Customer",
+				f"_Test Shipstation Customer {i // 2}",
+			)
+		)
+
+	frappe.db.bulk_insert(
+		"Address",
+		["name", "address_title", "address_type", "address_line1", "city"],
+		addresses,
+		ignore_duplicates=True,
+	)
+	frappe.db.bulk_insert(
+		"Dynamic Link",
+		["name", "parent", "parenttype", "parentfield", "link_doctype", "link_name"],
+		links,
+	)
+
+
+def delete_synced_documents(since: datetime.datetime):
+	"""
+	Delete the documents that were synced since the given time.
+	"""
+
+	for doctype in SYNCED_DOCTYPES:
+		for name in frappe.get_all(
+			doctype, filters={"creation": [">=", since]}, order_by="creation desc", pluck="name"
+		):
+			doc = frappe.get_doc(doctype, name)
+			if doc.docstatus == 1:
+				doc.cancel()
+			frappe.delete_doc(doctype, name, force=True, ignore_permissions=True)
+
+	frappe.db.commit()
@@ -0,0 +1,218 @@
+import hmac
+import re
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+from urllib.parse import parse_qsl, urlparse
+
+import frappe
+from frappe import _
+
+from shipstation_integration.context import SyncContext
+from shipstation_integration.fetch import iter_pages
+from shipstation_integration.orders import list_orders, process_orders
+from shipstation_integration.shipments import list_shipments, process_shipments
+
+if TYPE_CHECKING:
+	from shipstation_integration.shipstation_integration.doctype.shipstation_settings.shipstation_settings import (
+		ShipstationSettings,
+	)
+	from shipstation_integration.shipstation_integration.doctype.shipstation_store.shipstation_store import (
+		ShipstationStore,
+	)
+
+# the resource types that can be processed, mapped to the API path they point to
+WEBHOOK_RESOURCES = {
+	"ORDER_NOTIFY": "/orders",
+	"SHIP_NOTIFY": "/shipments",
+}
+
+# webhook jobs run on the short queue, so they only wait so long for a poll to finish
+WEBHOOK_LOCK_WAIT = 4 * 60
+# a lock is released after this long, in case the job holding it was killed
+SYNC_LOCK_TIMEOUT = 2 * 60 * 60
+
+
+@frappe.whitelist(allow_guest=True, methods=["POST"])
+def handle_webhook(
+	settings: str, token: str, resource_url: str = None, resource_type: str = None, **kwargs
+):
+	"""
+	Endpoint for Shipstation's ORDER_NOTIFY and SHIP_NOTIFY webhooks. The referenced
+	batch is fetched and processed in a background job.
+	"""
+
+	# unknown accounts are rejected the same way as invalid tokens, so callers can't
+	# find out which accounts exist
+	account = frappe.db.get_value(
+		"Shipstation Settings",
+		settings,
+		["enabled", "enable_webhooks", "webhook_token"],
+		as_dict=True,
+	)
+	if (
+		not account
+		or not account.enabled
+		or not account.enable_webhooks
+		or not account.webhook_token
+		or not hmac.compare_digest(account.webhook_token, token or "")
+	):
+		raise frappe.AuthenticationError
+
+	settings_doc: "ShipstationSettings" = frappe.get_doc("Shipstation Settings", settings)
+	if resource_type not in WEBHOOK_RESOURCES:
+		frappe.throw(_("Unsupported Shipstation webhook: {0}").format(resource_type))
+
+	store = get_webhook_store(settings_doc, resource_url, resource_type)
+	if not store:
+		return {"status": "ignored"}
+
+	# Shipstation retries notifications, so the same batch is only queued once
+	frappe.enqueue(
+		"shipstation_integration.webhooks.process_webhook",
+		queue="short",
+		job_id=f"shipstation_webhook|{settings_doc.name}|{resource_url}",
+		deduplicate=True,
+		settings=settings_doc.name,
+		resource_url=resource_url,
+		resource_type=resource_type,
+	)
+
+	return {"status": "queued"}
+
+
+def get_webhook_store(
+	settings: "ShipstationSettings", resource_url: str, resource_type: str
+) -> "ShipstationStore | None":
+	"""
+	Validate that a webhook's resource URL points to the Shipstation API, and get
+	the store that it refers to, if the store is set up to sync the resource.
+	"""
+
+	# the resource is fetched with the account's credentials, so it must never
+	# point anywhere other than the Shipstation API
+	resource = urlparse(resource_url or "")
+	api = urlparse(settings.client().url)
+	if (
+		resource.scheme != api.scheme
+		or resource.netloc != api.netloc
+		or resource.path.rstrip("/") != WEBHOOK_RESOURCES[resource_type]
+	):
+		frappe.throw(_("Invalid Shipstation webhook resource URL"))
+
+	store_id = {key.lower(): value for key, value in parse_qsl(resource.query)}.get("storeid")
+
+	store: "ShipstationStore"
+	for store in settings.shipstation_stores:
+		if str(store.store_id) != store_id:
+			continue
+
+		if resource_type == "ORDER_NOTIFY" and store.enable_orders:
+			return store
+		if resource_type == "SHIP_NOTIFY" and store.enable_shipments:
+			return store
+
+
+def process_webhook(settings: str, resource_url: str, resource_type: str):
+	settings_doc: "ShipstationSettings" = frappe.get_doc("Shipstation Settings", settings)
+	store = get_webhook_store(settings_doc, resource_url, resource_type)
+	if not store:
+		return
+
+	client = settings_doc.client()
+	client.timeout = 60
+
+	# batches are synced under the same lock as the account's polls, so two jobs
+	# can't both create a Sales Order for an order that's in both of them
+	with sync_lock(settings_doc.name, blocking_timeout=WEBHOOK_LOCK_WAIT):
+		if resource_type == "ORDER_NOTIFY":
+			orders = get_batch_records(client.list_orders, resource_url, {"store_id": store.store_id})
+			if not orders:
+				return
+
+			context = SyncContext()
+			context.add_settings(settings_doc)
+			process_orders(settings_doc, store, orders, context)
+			context.save_new_options()
+
+		elif resource_type == "SHIP_NOTIFY":
+			# the sync needs the shipment items, which batches leave out by default
+			shipments = get_batch_records(
+				client.list_shipments,
+				resource_url,
+				{"store_id": store.store_id, "include_shipment_items": True},
+			)
+			if not shipments:
+				return
+
+			process_shipments(settings_doc, store, shipments)
+
+		frappe.db.commit()
+
+
+def get_batch_records(list_method: Callable, resource_url: str, parameters: dict) -> list:
+	"""
+	Fetch the records in a notification's batch through the client's list method,
+	so they're structured into the same models as the sync.
+	"""
+
+	# the batch is identified by its query parameters (e.g. `importBatch`), which
+	# the list methods take in snake case
+	batch_parameters = {
+		re.sub(r"(?<=[a-z])(?=[A-Z])", "_", key).lower(): value
+		for key, value in parse_qsl(urlparse(resource_url).query)
+	}
+
+	records = []
+	for page in iter_pages(list_method, {**batch_parameters, **parameters}):
+		records.extend(record for record in page if record)
+	return records
+
+
+@contextmanager
+def sync_lock(settings: str, blocking_timeout: int | None = None) -> Iterator[None]:
+	"""
+	Hold the account's sync lock, shared by every worker on the site.
+
+	Raises:
+		frappe.ValidationError: if the lock can't be acquired within `blocking_timeout` seconds
+	"""
+
+	lock = frappe.cache().lock(
+		frappe.cache().make_key(f"shipstation_sync_lock|{settings}"),
+		timeout=SYNC_LOCK_TIMEOUT,
+		blocking_timeout=blocking_timeout,
+	)
+	if not lock.acquire():
+		frappe.throw(_("Shipstation Settings {0} is already being synced").format(settings))
+
+	try:
+		yield
+	finally:
+		lock.release()
+
+
+def poll_orders():
+	"""
+	Low-frequency safety net for accounts that receive orders through webhooks,
+	in case a notification was missed.
+	"""
+
+	for settings in frappe.get_all(
+		"Shipstation Settings", filters={"enabled": True, "enable_webhooks": True}
+	):
+		with sync_lock(settings.name, blocking_timeout=SYNC_LOCK_TIMEOUT):
+			list_orders(settings)
+
+
+def poll_shipments():
+	"""
+	Low-frequency safety net for accounts that receive shipments through webhooks,
+	in case a notification was missed.
+	"""
+
+	for settings in frappe.get_all(
+		"Shipstation Settings", filters={"enabled": True, "enable_webhooks": True}
+	):
+		with sync_lock(settings.name, blocking_timeout=SYNC_LOCK_TIMEOUT):
+			list_shipments(settings)